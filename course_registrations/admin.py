@@ -1,15 +1,17 @@
-import csv
 from datetime import date
 
 from django.contrib import admin
-from django.http import HttpResponse
+from django.db import transaction
 from django.utils.html import format_html
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
+from django.utils.translation import ngettext
 
-from danbw_website import utils
+from courses.models import InternalCourse
+from danbw_website import cache, utils
 
-from .models import CourseRegistration
+from .models import (REGISTERED_COURSES_CACHE_KEY, CourseRegistration,
+                     CourseRegistrationSummary)
 
 
 class FutureCourseFilter(admin.SimpleListFilter):
@@ -41,13 +43,15 @@ class CourseFilter(admin.SimpleListFilter):
     parameter_name = "course"
 
     def lookups(self, request, model_admin):
-        courses = CourseRegistration.objects.values_list(
-            "course__title", flat=True).distinct().order_by("-course__start_date")
-        return tuple((course, course) for course in courses)
+        # Invalidated by signals when registrations or courses change
+        return cache.get_or_set(
+            REGISTERED_COURSES_CACHE_KEY,
+            CourseRegistration.objects.registered_courses,
+        )
 
     def queryset(self, request, queryset):
         if self.value():
-            return queryset.filter(course__title=self.value())
+            return queryset.filter(course_id=self.value())
         return queryset
 
 
@@ -119,6 +123,9 @@ class CourseRegistrationAdmin(admin.ModelAdmin):
         "toggle_payment_status", "export_csv"
     ]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_sessions()
+
     def registration_str(self, obj):
         return str(obj)
     registration_str.short_description = _("Name")
@@ -128,9 +135,20 @@ class CourseRegistrationAdmin(admin.ModelAdmin):
 
     def toggle_payment_status(self, request, queryset):
         """Action for toggling the payment status of registrations"""
-        for registration in queryset:
-            registration.payment_status = not registration.payment_status
-            registration.save()
+        # Selected by primary key, since the changelist may be filtered by
+        # the toggled field
+        registrations = CourseRegistration.objects.filter(
+            pk__in=list(queryset.values_list("pk", flat=True)))
+        with transaction.atomic():
+            updated = registrations.update(
+                payment_status=utils.toggle_expression(
+                    CourseRegistration, "payment_status"))
+            # Bulk updates bypass the signals maintaining the summaries,
+            # whose paid counts and fees depend on the payment status
+            CourseRegistrationSummary.objects.rebuild(
+                InternalCourse.objects.filter(
+                    pk__in=registrations.values("course_id")))
+        utils.report_updated(self, request, updated)
 
     toggle_payment_status.short_description = _(
         "Toggle payment status of selected registrations"
@@ -139,15 +157,59 @@ class CourseRegistrationAdmin(admin.ModelAdmin):
     def export_csv(self, request, queryset):
         """Action for exporting course registrations to CSV"""
 
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = (
-            f"attachment; filename={_('csv_export')}_{slugify(date.today())}.csv"
+        return utils.csv_response(
+            f"{_('csv_export')}_{slugify(date.today())}.csv",
+            utils.write_registrations_csv,
+            queryset,
         )
-        writer = csv.writer(response)
-
-        utils.write_registrations_csv(writer, queryset)
-
-        return response
 
     export_csv.short_description = _(
         "Export selected course registrations to CSV")
+
+
+@admin.register(CourseRegistrationSummary)
+class CourseRegistrationSummaryAdmin(admin.ModelAdmin):
+    """Read-only dashboard of the registration summaries. Each row is
+    maintained from the registrations, so no registrations are scanned."""
+
+    list_display = [
+        "course",
+        "session",
+        "participant_count",
+        "paid_count",
+        "unpaid_count",
+        "exam_count",
+        "dinner_count",
+        "overnight_count",
+        "bank_transfer_revenue",
+        "cash_revenue",
+        "paid_revenue",
+        "updated",
+    ]
+    list_filter = [FutureCourseFilter, ("session", admin.EmptyFieldListFilter)]
+    list_select_related = ["course", "session"]
+    search_fields = ["course__title"]
+    ordering = ["-course__start_date", "session__date", "session__start_time"]
+    actions = ["rebuild_summaries"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def rebuild_summaries(self, request, queryset):
+        """Action for recomputing the summaries of the selected courses"""
+        count = CourseRegistrationSummary.objects.rebuild(
+            InternalCourse.objects.filter(pk__in=queryset.values("course_id")))
+        self.message_user(request, ngettext(
+            "Rebuilt the summary of %(count)d course.",
+            "Rebuilt the summaries of %(count)d courses.",
+            count,
+        ) % {"count": count})
+
+    rebuild_summaries.short_description = _(
+        "Rebuild summaries of the selected courses")
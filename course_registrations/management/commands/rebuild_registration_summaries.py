@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from course_registrations.models import CourseRegistrationSummary
+from courses.models import CourseSession, InternalCourse
+
+
+class Command(BaseCommand):
+    help = ("Recomputes the registration summaries and the session "
+            "occupancy of internal courses")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "slugs",
+            nargs="*",
+            help="Slugs of the courses to rebuild, all courses if omitted",
+        )
+
+    def handle(self, *args, **options):
+        courses = InternalCourse.objects.all()
+        if options["slugs"]:
+            courses = courses.filter(slug__in=options["slugs"])
+        sessions = CourseSession.objects.filter(course__in=courses)
+        updated = sessions.recount_occupancy()
+        self.stdout.write(f"Recounted occupancy of {updated} sessions.")
+        count = CourseRegistrationSummary.objects.rebuild(courses)
+        self.stdout.write(f"Rebuilt summaries of {count} courses.")
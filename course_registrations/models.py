@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
@@ -7,6 +9,46 @@ from courses.models import CourseSession, InternalCourse
 from danbw_website import constants
 from users.models import User, UserProfile
 
+REGISTERED_COURSES_CACHE_KEY = "registered_courses"
+
+# Fields of a registration that its share in the summaries depends on
+SUMMARY_FIELDS = ("payment_status", "payment_method", "final_fee", "exam",
+                  "dinner", "overnight_stay")
+
+
+class CourseRegistrationQuerySet(models.QuerySet):
+    """Custom queryset for course registrations"""
+
+    def set_user_registered(self, courses, user):
+        """Attaches the registration of the given user to each course as
+        user_registration and user_registered, using a single query for
+        all courses"""
+        registrations = {}
+        if user.is_authenticated:
+            registrations = {
+                registration.course_id: registration
+                for registration in self.filter(user=user)
+            }
+        for course in courses:
+            course.user_registration = registrations.get(course.pk)
+            course.user_registered = course.user_registration is not None
+        return courses
+
+    def registered_courses(self):
+        """Returns (id, title) tuples of the courses with registrations,
+        most recent courses first"""
+        return list(
+            InternalCourse.objects.filter(
+                pk__in=self.values("course_id")
+            ).order_by("-start_date").values_list("pk", "title")
+        )
+
+    def with_sessions(self):
+        """Loads the course with all its sessions and the selected sessions
+        of each registration, as used by truncated_session_display"""
+        return self.select_related("course").prefetch_related(
+            "course__sessions", "selected_sessions")
+
 
 class CourseRegistration(models.Model):
     """Represents a registration for a course by a user or guest"""
@@ -124,6 +166,8 @@ class CourseRegistration(models.Model):
         default=True,
     )
 
+    objects = CourseRegistrationQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -137,6 +181,14 @@ class CourseRegistration(models.Model):
                 condition=models.Q(email__isnull=False)
             )
         ]
+        indexes = [
+            # Exam registrations of a user awaiting a grade update
+            models.Index(
+                fields=["user", "exam"],
+                name="registration_grade_pending_idx",
+                condition=models.Q(grade_updated=False),
+            ),
+        ]
         verbose_name = _("Course Registration")
         verbose_name_plural = _("Course Registrations")
 
@@ -195,11 +247,12 @@ class CourseRegistration(models.Model):
         return f"{self.first_name} {self.last_name}"
 
     def truncated_session_display(self):
-        all_sessions = self.course.sessions.all()
-        if len(self.selected_sessions.all()) == len(all_sessions):
+        # Evaluated once, so that prefetched sessions are used if present
+        selected_sessions = list(self.selected_sessions.all())
+        if len(selected_sessions) == len(self.course.sessions.all()):
             return _("Entire Course")
         else:
-            sessions = "\n".join([str(session) for session in self.selected_sessions.all()])
+            sessions = "\n".join([str(session) for session in selected_sessions])
             truncated = sessions[:30] + \
                 "..." if len(sessions) > 30 else sessions
             return format_html('<span title="{}">{}</span>', sessions, truncated)
@@ -212,3 +265,153 @@ class CourseRegistration(models.Model):
             return format_html('<span title="{}">{}</span>', self.comment, truncated)
         return ""
     truncated_comment.short_description = _("Comment")
+
+    def summary_values(self):
+        """Share of the registration in the CourseRegistrationSummary of its
+        course and of each of its selected sessions"""
+        fee = self.final_fee or 0
+        return {
+            "participant_count": 1,
+            "paid_count": int(self.payment_status == 1),
+            "unpaid_count": int(self.payment_status == 0),
+            "exam_count": int(self.exam is True),
+            "dinner_count": int(self.dinner is True),
+            "overnight_count": int(self.overnight_stay is True),
+            "bank_transfer_revenue":
+                fee if self.payment_method == constants.BANK else 0,
+            "cash_revenue": fee if self.payment_method == constants.CASH else 0,
+            "paid_revenue": fee if self.payment_status == 1 else 0,
+        }
+
+
+def _summary_aggregates():
+    """Aggregates of the registration counts and fees stored in a
+    CourseRegistrationSummary, the sum of CourseRegistration.summary_values
+    over the registrations"""
+    return {
+        "participant_count": Count("pk"),
+        "paid_count": Count("pk", filter=Q(payment_status=1)),
+        "unpaid_count": Count("pk", filter=Q(payment_status=0)),
+        "exam_count": Count("pk", filter=Q(exam=True)),
+        "dinner_count": Count("pk", filter=Q(dinner=True)),
+        "overnight_count": Count("pk", filter=Q(overnight_stay=True)),
+        "bank_transfer_revenue": Sum(
+            "final_fee", filter=Q(payment_method=constants.BANK), default=0),
+        "cash_revenue": Sum(
+            "final_fee", filter=Q(payment_method=constants.CASH), default=0),
+        "paid_revenue": Sum(
+            "final_fee", filter=Q(payment_status=1), default=0),
+    }
+
+
+class CourseRegistrationSummaryQuerySet(models.QuerySet):
+    """Custom queryset for maintaining the registration summaries"""
+
+    def add_values(self, values, sign=1):
+        """Adds the given counts and fees to the summaries of the queryset,
+        or subtracts them with sign=-1, in a single UPDATE. Concurrent
+        changes are added up by the database instead of overwriting each
+        other."""
+        changes = {
+            field: F(field) + sign * value
+            for field, value in values.items() if value
+        }
+        if changes:
+            self.update(updated=timezone.now(), **changes)
+
+    def refresh(self, course_id):
+        """Recomputes the summary of a course and of each of its sessions
+        from its registrations with two aggregate queries. Does nothing if
+        the course has been deleted."""
+        with transaction.atomic():
+            # Serializes concurrent refreshes of the same course
+            if not InternalCourse.objects.select_for_update().filter(
+                    pk=course_id).exists():
+                return
+            registrations = CourseRegistration.objects.filter(
+                course_id=course_id)
+            aggregates = _summary_aggregates()
+            course_totals = registrations.aggregate(**aggregates)
+            session_totals = {
+                row.pop("selected_sessions"): row
+                for row in registrations.filter(
+                    selected_sessions__isnull=False
+                ).values("selected_sessions").annotate(
+                    **aggregates).order_by()
+            }
+            summaries = [self.model(course_id=course_id, **course_totals)]
+            for session_id in CourseSession.objects.filter(
+                    course_id=course_id).values_list("pk", flat=True):
+                summaries.append(self.model(
+                    course_id=course_id, session_id=session_id,
+                    **session_totals.get(session_id, {})))
+
+            self.filter(course_id=course_id).delete()
+            self.bulk_create(summaries)
+
+    def rebuild(self, courses=None):
+        """Recomputes the summaries of the given or all internal courses
+        and returns the number of courses"""
+        if courses is None:
+            courses = InternalCourse.objects.all()
+        course_ids = list(courses.values_list("pk", flat=True))
+        for course_id in course_ids:
+            self.refresh(course_id)
+        return len(course_ids)
+
+
+class CourseRegistrationSummary(models.Model):
+    """Registration counts and fees of a course, or of a single session if
+    session is set. Kept up to date by the signals of the registrations,
+    so that overviews do not have to aggregate all registrations."""
+
+    course = models.ForeignKey(
+        InternalCourse,
+        on_delete=models.CASCADE,
+        related_name="registration_summaries",
+        verbose_name=_("Course"),
+    )
+    session = models.ForeignKey(
+        CourseSession,
+        on_delete=models.CASCADE,
+        related_name="registration_summaries",
+        verbose_name=_("Session"),
+        null=True,
+        blank=True,
+    )
+    participant_count = models.IntegerField(_("Participants"), default=0)
+    paid_count = models.IntegerField(_("Paid"), default=0)
+    unpaid_count = models.IntegerField(_("Unpaid"), default=0)
+    exam_count = models.IntegerField(_("Exam"), default=0)
+    dinner_count = models.IntegerField(_("Dinner"), default=0)
+    overnight_count = models.IntegerField(_("Overnight stay"), default=0)
+    bank_transfer_revenue = models.IntegerField(
+        _("Bank Transfer"), default=0)
+    cash_revenue = models.IntegerField(_("Cash"), default=0)
+    paid_revenue = models.IntegerField(_("Paid fees"), default=0)
+    updated = models.DateTimeField(_("Last Modified"), auto_now=True)
+
+    objects = CourseRegistrationSummaryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["course"],
+                name="unique_course_summary",
+                condition=models.Q(session__isnull=True)
+            ),
+            models.UniqueConstraint(
+                fields=["course", "session"],
+                name="unique_session_summary",
+                condition=models.Q(session__isnull=False)
+            ),
+        ]
+        verbose_name = _("Registration Summary")
+        verbose_name_plural = _("Registration Summaries")
+
+    def __str__(self):
+        return str(self.session or self.course)
+
+    @property
+    def revenue(self):
+        return self.bank_transfer_revenue + self.cash_revenue
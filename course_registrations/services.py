@@ -0,0 +1,75 @@
+import logging
+from smtplib import SMTPException
+
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.translation import gettext as _
+
+from danbw_website import utils
+
+from .models import CourseRegistration
+
+logger = logging.getLogger(__name__)
+
+
+def save_registration(request, registration, selected_sessions):
+    """Saves a new or changed registration together with its selected
+    sessions in one transaction, so that no registration without sessions
+    is left behind.
+
+    Duplicate registrations are rejected by the unique_user_registration
+    and unique_guest_registration constraints instead of a prior lookup,
+    which concurrent requests could both pass. A full session is rejected
+    by the occupancy counters. Both raise a ValidationError, any other
+    IntegrityError is raised as is.
+
+    The emails for a new registration are sent once the transaction is
+    committed."""
+    adding = registration._state.adding
+    try:
+        with transaction.atomic():
+            registration.save()
+            registration.selected_sessions.set(selected_sessions)
+            if adding:
+                transaction.on_commit(
+                    lambda: send_registration_emails(request, registration),
+                    robust=True,
+                )
+    except IntegrityError:
+        if not is_duplicate(registration):
+            raise
+        if registration.user:
+            message = _("You are already registered for this course.")
+        else:
+            message = _(
+                "A registration with this email address already exists.")
+        raise ValidationError(message, code="duplicate")
+
+
+def is_duplicate(registration):
+    """Whether another registration of the same user or email exists for
+    the course, i.e. whether an IntegrityError was caused by the
+    unique_user_registration or unique_guest_registration constraint"""
+    duplicates = Q(email=registration.email) if registration.email else Q()
+    if registration.user_id:
+        duplicates |= Q(user_id=registration.user_id)
+    if not duplicates:
+        return False
+    return CourseRegistration.objects.filter(
+        duplicates, course_id=registration.course_id
+    ).exclude(pk=registration.pk).exists()
+
+
+def send_registration_emails(request, registration):
+    """Sends the registration emails. The registration is already committed,
+    so a failure is only reported to the user."""
+    try:
+        utils.send_registration_emails(request, registration)
+    except SMTPException as e:
+        logger.warning("Failed to send registration emails for %s: %s",
+                       registration.pk, e)
+        messages.warning(request, _(
+            "Your registration was saved, but the confirmation email could "
+            "not be sent."))
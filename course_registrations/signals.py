@@ -0,0 +1,141 @@
+from django.core.exceptions import ValidationError
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+
+from courses.models import CourseSession, InternalCourse
+from danbw_website import cache
+
+from .models import (REGISTERED_COURSES_CACHE_KEY, SUMMARY_FIELDS,
+                     CourseRegistration, CourseRegistrationSummary)
+
+
+@receiver([post_save, post_delete], sender=CourseRegistration)
+@receiver([post_save, post_delete], sender=InternalCourse)
+def registered_courses_changed(sender, instance, **kwargs):
+    cache.delete(REGISTERED_COURSES_CACHE_KEY)
+
+
+def course_summary(course_id):
+    return CourseRegistrationSummary.objects.filter(
+        course_id=course_id, session__isnull=True)
+
+
+def session_summaries(registration):
+    """Returns the summaries of the sessions selected by a registration"""
+    return CourseRegistrationSummary.objects.filter(
+        session__courseregistration=registration)
+
+
+@receiver(post_save, sender=InternalCourse)
+@receiver(post_save, sender=CourseSession)
+def create_summary(sender, instance, created, raw, **kwargs):
+    if not created or raw:
+        return
+    if sender is CourseSession:
+        CourseRegistrationSummary.objects.create(
+            course_id=instance.course_id, session=instance)
+    else:
+        CourseRegistrationSummary.objects.create(course=instance)
+
+
+@receiver(pre_save, sender=CourseRegistration)
+def remember_summary_values(sender, instance, raw, **kwargs):
+    """Loads the stored state of a changed registration, so that only the
+    difference is added to the summaries once it is saved"""
+    instance._previous = None
+    if not instance._state.adding and not raw:
+        instance._previous = CourseRegistration.objects.filter(
+            pk=instance.pk).only("course_id", *SUMMARY_FIELDS).first()
+
+
+@receiver(post_save, sender=CourseRegistration)
+def update_summaries(sender, instance, created, raw, **kwargs):
+    """Updates the summaries in the transaction of the registration, by the
+    share of a new registration or by the change of an existing one"""
+    if raw:
+        return
+    values = instance.summary_values()
+    previous = getattr(instance, "_previous", None)
+    if created or previous is None:
+        course_summary(instance.course_id).add_values(values)
+        return
+
+    previous_values = previous.summary_values()
+    changes = {
+        field: value - previous_values[field]
+        for field, value in values.items()
+    }
+    if previous.course_id == instance.course_id:
+        course_summary(instance.course_id).add_values(changes)
+    else:
+        course_summary(previous.course_id).add_values(previous_values, sign=-1)
+        course_summary(instance.course_id).add_values(values)
+    session_summaries(instance).add_values(changes)
+
+
+@receiver(pre_delete, sender=CourseRegistration)
+def remove_from_summaries(sender, instance, **kwargs):
+    values = instance.summary_values()
+    course_summary(instance.course_id).add_values(values, sign=-1)
+    session_summaries(instance).add_values(values, sign=-1)
+
+
+@receiver(m2m_changed, sender=CourseRegistration.selected_sessions.through)
+def selected_sessions_changed(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    """Adds the share of a registration to the summaries of the sessions
+    it selects and removes it from those it no longer selects. Changes
+    from the side of a session recompute the summaries of its course."""
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            CourseRegistrationSummary.objects.refresh(instance.course_id)
+        return
+    if action == "post_add":
+        CourseRegistrationSummary.objects.filter(
+            session__in=pk_set).add_values(instance.summary_values())
+    elif action == "pre_remove":
+        session_summaries(instance).filter(
+            session__in=pk_set).add_values(
+                instance.summary_values(), sign=-1)
+    elif action == "pre_clear":
+        session_summaries(instance).add_values(
+            instance.summary_values(), sign=-1)
+
+
+@receiver(m2m_changed, sender=CourseRegistration.selected_sessions.through)
+def update_session_occupancy(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Keeps the occupancy of sessions in step with the selected sessions of
+    registrations. Runs in the transaction of the m2m change, so a full
+    session rolls back the whole change. Only changes from the side of the
+    registration are counted."""
+    if reverse:
+        return
+    if action == "pre_add":
+        # One UPDATE per session in a fixed order, so that concurrent
+        # registrations lock the sessions in the same order
+        full = [
+            pk for pk in sorted(pk_set)
+            if not CourseSession.objects.filter(pk=pk).reserve()
+        ]
+        if full:
+            raise ValidationError(
+                _("The following sessions are fully booked: %(sessions)s"),
+                code="session_full",
+                params={"sessions": ", ".join(
+                    str(session)
+                    for session in CourseSession.objects.filter(pk__in=full)
+                )},
+            )
+    elif action == "pre_remove":
+        CourseSession.objects.filter(
+            pk__in=pk_set, courseregistration=instance).release()
+    elif action == "pre_clear":
+        CourseSession.objects.filter(courseregistration=instance).release()
+
+
+@receiver(pre_delete, sender=CourseRegistration)
+def release_sessions(sender, instance, **kwargs):
+    CourseSession.objects.filter(courseregistration=instance).release()
@@ -0,0 +1,93 @@
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+from django.utils import translation
+
+from courses.models import CourseSession, ExternalCourse, InternalCourse
+from users.models import User, UserProfile
+
+from .models import CourseRegistration
+
+
+class TestCourseRegistrationQuerySet(TestCase):
+    """Tests for the CourseRegistrationQuerySet"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="test-user", password="testpassword"
+        )
+        UserProfile.objects.create(user=self.user, dojo="AAR")
+        self.courses = [
+            InternalCourse.objects.create(
+                title=f"Test course {i}",
+                start_date=date.today() + timedelta(days=i),
+                end_date=date.today() + timedelta(days=i),
+            )
+            for i in range(3)
+        ]
+        self.external_course = ExternalCourse.objects.create(
+            title="External course")
+        self.registration = CourseRegistration.objects.create(
+            user=self.user,
+            course=self.courses[1],
+            accept_terms=True,
+        )
+
+    def test_set_user_registered(self):
+        print("\ntest_set_user_registered")
+        courses = self.courses + [self.external_course]
+        with self.assertNumQueries(1):
+            CourseRegistration.objects.set_user_registered(courses, self.user)
+
+        self.assertEqual(
+            [course.user_registered for course in courses],
+            [False, True, False, False],
+        )
+        self.assertEqual(courses[1].user_registration, self.registration)
+
+    def test_set_user_registered_anonymous_user(self):
+        print("\ntest_set_user_registered_anonymous_user")
+        with self.assertNumQueries(0):
+            CourseRegistration.objects.set_user_registered(
+                self.courses, AnonymousUser())
+        self.assertFalse(any(course.user_registered for course in self.courses))
+
+
+class TestTruncatedSessionDisplay(TestCase):
+    """Tests for CourseRegistration.truncated_session_display"""
+
+    def setUp(self):
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today(),
+            end_date=date.today(),
+        )
+        self.sessions = [
+            CourseSession.objects.create(
+                title=f"Session {i}",
+                course=self.course,
+                date=date.today(),
+                start_time=time(10 + i),
+                end_time=time(11 + i),
+            )
+            for i in range(2)
+        ]
+        for i in range(5):
+            registration = CourseRegistration.objects.create(
+                course=self.course,
+                email=f"guest{i}@example.com",
+                accept_terms=True,
+            )
+            registration.selected_sessions.set(self.sessions[:i % 2 + 1])
+
+    def test_uses_prefetched_sessions(self):
+        print("\ntest_uses_prefetched_sessions")
+        # Registrations with courses, course sessions, selected sessions
+        with self.assertNumQueries(3), translation.override("en"):
+            displays = [
+                str(registration.truncated_session_display())
+                for registration in CourseRegistration.objects.with_sessions()
+            ]
+        self.assertEqual(displays.count("Entire Course"), 2)
+        self.assertIn("Session 0", displays[0])
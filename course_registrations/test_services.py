@@ -0,0 +1,188 @@
+import threading
+import time
+from datetime import date, timedelta
+from smtplib import SMTPException
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import F
+from django.test import RequestFactory, TestCase, TransactionTestCase
+
+from courses.models import CourseSession, InternalCourse
+
+from . import services
+from .models import CourseRegistration, CourseRegistrationSummary
+
+THREADS = 8
+
+
+def make_request():
+    request = RequestFactory().post("/")
+    request.user = AnonymousUser()
+    request.LANGUAGE_CODE = "de"
+    request.session = {}
+    request._messages = FallbackStorage(request)
+    return request
+
+
+def create_course():
+    course = InternalCourse.objects.create(
+        title="Test course",
+        start_date=date.today() + timedelta(days=10),
+        end_date=date.today() + timedelta(days=10),
+    )
+    session = CourseSession.objects.create(
+        title="Session", course=course, capacity=3)
+    return course, session
+
+
+class SaveRegistrationTest(TestCase):
+    """Tests for the registration service"""
+
+    def setUp(self):
+        self.course, self.session = create_course()
+
+    def save(self, email):
+        registration = CourseRegistration(
+            course=self.course, email=email, accept_terms=True)
+        request = make_request()
+        with self.captureOnCommitCallbacks(execute=True):
+            services.save_registration(request, registration, [self.session])
+        return registration, request
+
+    def test_emails_are_sent_on_commit(self):
+        print("\ntest_emails_are_sent_on_commit")
+        registration, _ = self.save("guest@example.com")
+        self.assertEqual(list(registration.selected_sessions.all()),
+                         [self.session])
+        self.assertEqual(mail.outbox[0].to, ["guest@example.com"])
+
+    def test_duplicate_registration(self):
+        print("\ntest_duplicate_registration")
+        self.save("guest@example.com")
+        mail.outbox.clear()
+        with self.assertRaises(ValidationError) as cm:
+            self.save("guest@example.com")
+        self.assertEqual(cm.exception.code, "duplicate")
+        self.assertEqual(CourseRegistration.objects.count(), 1)
+        self.assertEqual(mail.outbox, [])
+
+    def test_other_integrity_errors_are_raised(self):
+        print("\ntest_other_integrity_errors_are_raised")
+        registration = CourseRegistration(
+            course=self.course, email="guest@example.com", final_fee=None)
+        with self.assertRaises(IntegrityError):
+            services.save_registration(
+                make_request(), registration, [self.session])
+
+    def test_full_session_sends_no_emails(self):
+        print("\ntest_full_session_sends_no_emails")
+        for i in range(3):
+            self.save(f"guest{i}@example.com")
+        mail.outbox.clear()
+        with self.assertRaises(ValidationError):
+            self.save("late@example.com")
+        self.assertFalse(CourseRegistration.objects.filter(
+            email="late@example.com").exists())
+        self.assertEqual(mail.outbox, [])
+
+    def test_failed_email_keeps_registration(self):
+        print("\ntest_failed_email_keeps_registration")
+        with patch("danbw_website.utils.send_registration_emails",
+                   side_effect=SMTPException("Connection refused")):
+            registration, request = self.save("guest@example.com")
+        self.assertTrue(CourseRegistration.objects.filter(
+            pk=registration.pk).exists())
+        self.assertEqual(len(request._messages), 1)
+
+
+class ConcurrentRegistrationTest(TransactionTestCase):
+    """Registers from several threads at the same time and checks that the
+    constraints and occupancy counters hold"""
+
+    def setUp(self):
+        self.course, self.session = create_course()
+
+    def register_concurrently(self, emails):
+        barrier = threading.Barrier(len(emails))
+        results = []
+
+        def register(email):
+            registration = CourseRegistration(
+                course=self.course, email=email, accept_terms=True)
+            barrier.wait()
+            try:
+                # SQLite allows only one writer and reports a lock
+                # instead of waiting, so locked attempts are retried
+                for attempt in range(50):
+                    try:
+                        services.save_registration(
+                            make_request(), registration, [self.session])
+                        results.append("saved")
+                        return
+                    except OperationalError:
+                        registration.pk = None
+                        registration._state.adding = True
+                        time.sleep(0.01)
+                results.append("locked")
+            except ValidationError as e:
+                results.append(e.code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=register, args=[email])
+            for email in emails
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Without at least two attempts reaching the database there is no
+        # race to test, and the counts below would hold trivially
+        self.assertGreaterEqual(
+            len(results) - results.count("locked"), 2, results)
+        return results
+
+    def assertSummaries(self, participants):
+        """The summaries of the course and of its session count the saved
+        registrations"""
+        summaries = CourseRegistrationSummary.objects.filter(
+            course=self.course).order_by(F("session").asc(nulls_first=True))
+        self.assertEqual(
+            list(summaries.values_list("session", "participant_count")),
+            [(None, participants), (self.session.pk, participants)])
+
+    def test_concurrent_duplicates(self):
+        print("\ntest_concurrent_duplicates")
+        results = self.register_concurrently(["guest@example.com"] * THREADS)
+        # Attempts still locked after all retries on SQLite did not save
+        # anything. Any other attempt either saved or saw the saved one.
+        attempted = THREADS - results.count("locked")
+        saved = min(1, attempted)
+        self.assertEqual(results.count("saved"), saved)
+        self.assertEqual(results.count("duplicate"), attempted - saved)
+        self.assertEqual(CourseRegistration.objects.count(), saved)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.occupancy, saved)
+        self.assertSummaries(saved)
+
+    def test_concurrent_registrations_respect_capacity(self):
+        print("\ntest_concurrent_registrations_respect_capacity")
+        results = self.register_concurrently(
+            [f"guest{i}@example.com" for i in range(THREADS)])
+        attempted = THREADS - results.count("locked")
+        saved = min(3, attempted)
+        self.assertEqual(results.count("saved"), saved)
+        self.assertEqual(results.count("session_full"), attempted - saved)
+        # No registration is left without its session
+        self.assertEqual(CourseRegistration.objects.count(), saved)
+        self.assertEqual(CourseRegistration.objects.filter(
+            selected_sessions=self.session).count(), saved)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.occupancy, saved)
+        self.assertSummaries(saved)
@@ -0,0 +1,348 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from courses.models import CourseSession, InternalCourse
+from danbw_website import constants
+from users.models import User, UserProfile
+
+from .admin import CourseFilter
+from .models import CourseRegistration, CourseRegistrationSummary
+
+
+# Query counts assume a cache that does not use the database
+@override_settings(CACHES={"default": settings.CACHE_BACKENDS["locmem"]})
+class RegisteredCoursesCacheTest(TestCase):
+    """Tests for the cached course lookups of the CourseFilter"""
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get("/")
+        self.model_admin = site._registry[CourseRegistration]
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today(),
+            end_date=date.today(),
+        )
+        self.other_course = InternalCourse.objects.create(
+            title="Other course",
+            start_date=date.today() + timedelta(days=1),
+            end_date=date.today() + timedelta(days=1),
+        )
+        CourseRegistration.objects.create(
+            course=self.course, email="guest@example.com", accept_terms=True)
+
+    def get_lookups(self):
+        course_filter = CourseFilter(
+            self.request, {}, CourseRegistration, self.model_admin)
+        return course_filter.lookup_choices
+
+    def test_lookups_are_cached(self):
+        print("\ntest_lookups_are_cached")
+        self.assertEqual(
+            self.get_lookups(), [(self.course.pk, "Test course")])
+        with self.assertNumQueries(0):
+            self.get_lookups()
+
+    def test_lookups_are_invalidated(self):
+        print("\ntest_lookups_are_invalidated")
+        self.get_lookups()
+        registration = CourseRegistration.objects.create(
+            course=self.other_course,
+            email="guest@example.com",
+            accept_terms=True,
+        )
+        self.assertEqual(self.get_lookups(), [
+            (self.other_course.pk, "Other course"),
+            (self.course.pk, "Test course"),
+        ])
+
+        registration.delete()
+        self.course.title = "Renamed course"
+        self.course.save()
+        self.assertEqual(
+            self.get_lookups(), [(self.course.pk, "Renamed course")])
+
+    def test_queryset_filters_by_course_id(self):
+        print("\ntest_queryset_filters_by_course_id")
+        course_filter = CourseFilter(
+            self.request, {"course": [str(self.other_course.pk)]},
+            CourseRegistration, self.model_admin)
+        self.assertFalse(course_filter.queryset(
+            self.request, CourseRegistration.objects.all()).exists())
+
+
+# Query counts assume a cache that does not use the database
+@override_settings(CACHES={"default": settings.CACHE_BACKENDS["locmem"]})
+class RegistrationSummaryTest(TestCase):
+    """Tests for maintaining the registration summaries"""
+
+    def setUp(self):
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today(),
+            end_date=date.today(),
+        )
+        self.sessions = [
+            self.course.sessions.create(title=f"Session {i}")
+            for i in range(2)
+        ]
+
+    def register(self, email, sessions, **kwargs):
+        registration = CourseRegistration.objects.create(
+            course=self.course, email=email, accept_terms=True, **kwargs)
+        registration.selected_sessions.set(sessions)
+        return registration
+
+    def summary(self, session=None):
+        return CourseRegistrationSummary.objects.get(
+            course=self.course, session=session)
+
+    def assertSummariesAreAggregates(self):
+        """The incrementally maintained summaries equal a full refresh"""
+        fields = [field for field in CourseRegistration().summary_values()]
+        summaries = list(CourseRegistrationSummary.objects.order_by(
+            "course", "session").values(*fields))
+        CourseRegistrationSummary.objects.rebuild()
+        self.assertEqual(summaries, list(
+            CourseRegistrationSummary.objects.order_by(
+                "course", "session").values(*fields)))
+
+    def test_summary_is_updated(self):
+        print("\ntest_summary_is_updated")
+        self.register("a@example.com", self.sessions, final_fee=100,
+                      payment_status=1, exam=True)
+        registration = self.register(
+            "b@example.com", self.sessions[:1], final_fee=30,
+            payment_method=constants.CASH)
+
+        summary = self.summary()
+        self.assertEqual(summary.participant_count, 2)
+        self.assertEqual(summary.paid_count, 1)
+        self.assertEqual(summary.unpaid_count, 1)
+        self.assertEqual(summary.exam_count, 1)
+        self.assertEqual(summary.bank_transfer_revenue, 100)
+        self.assertEqual(summary.cash_revenue, 30)
+        self.assertEqual(summary.paid_revenue, 100)
+        self.assertEqual(summary.revenue, 130)
+        self.assertEqual(self.summary(self.sessions[0]).participant_count, 2)
+        self.assertEqual(self.summary(self.sessions[1]).participant_count, 1)
+
+        registration.selected_sessions.set(self.sessions[1:])
+        self.assertEqual(self.summary(self.sessions[0]).participant_count, 1)
+        self.assertEqual(self.summary(self.sessions[1]).participant_count, 2)
+
+        registration.delete()
+        self.assertEqual(self.summary().participant_count, 1)
+        self.assertEqual(self.summary().cash_revenue, 0)
+        self.assertSummariesAreAggregates()
+
+    def test_changed_registration_updates_summary(self):
+        print("\ntest_changed_registration_updates_summary")
+        registration = self.register(
+            "a@example.com", self.sessions, final_fee=50)
+        registration.payment_status = 1
+        registration.final_fee = 80
+        # The stored state, the registration and two summary updates
+        with self.assertNumQueries(4):
+            registration.save()
+
+        self.assertEqual(self.summary().paid_count, 1)
+        self.assertEqual(self.summary().unpaid_count, 0)
+        self.assertEqual(self.summary().paid_revenue, 80)
+        self.assertEqual(self.summary(self.sessions[1]).paid_revenue, 80)
+
+        # Changes that do not affect the summaries do not update them
+        registration.comment = "Comment"
+        with self.assertNumQueries(2):
+            registration.save()
+        self.assertSummariesAreAggregates()
+
+    def test_moved_registration_updates_both_courses(self):
+        print("\ntest_moved_registration_updates_both_courses")
+        other_course = InternalCourse.objects.create(
+            title="Other course",
+            start_date=date.today(),
+            end_date=date.today(),
+        )
+        registration = self.register(
+            "a@example.com", self.sessions, final_fee=50)
+        registration.course = other_course
+        registration.save()
+        registration.selected_sessions.clear()
+
+        self.assertEqual(self.summary().participant_count, 0)
+        self.assertEqual(self.summary(self.sessions[0]).participant_count, 0)
+        self.assertEqual(CourseRegistrationSummary.objects.get(
+            course=other_course, session=None).participant_count, 1)
+        self.assertSummariesAreAggregates()
+
+    def test_rolled_back_registration_is_not_counted(self):
+        print("\ntest_rolled_back_registration_is_not_counted")
+        try:
+            with transaction.atomic():
+                self.register("a@example.com", self.sessions)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(self.summary().participant_count, 0)
+        self.assertEqual(self.summary(self.sessions[0]).participant_count, 0)
+
+    def test_changes_from_session_side(self):
+        print("\ntest_changes_from_session_side")
+        registration = self.register("a@example.com", self.sessions[:1])
+        self.sessions[1].courseregistration_set.add(registration)
+        self.assertEqual(self.summary(self.sessions[1]).participant_count, 1)
+        self.assertSummariesAreAggregates()
+
+    def test_toggle_payment_status_updates_summary(self):
+        print("\ntest_toggle_payment_status_updates_summary")
+        user = User.objects.create_user(
+            username="user", email="user@example.com")
+        UserProfile.objects.create(user=user, dojo="Profile dojo")
+        registration = CourseRegistration.objects.create(
+            course=self.course, user=user, accept_terms=True, final_fee=50)
+        registration.selected_sessions.set(self.sessions)
+        CourseRegistration.objects.filter(pk=registration.pk).update(
+            dojo="Dojo at registration")
+
+        request = RequestFactory().post("/")
+        model_admin = site._registry[CourseRegistration]
+        with patch.object(model_admin, "message_user"):
+            model_admin.toggle_payment_status(
+                request, CourseRegistration.objects.all())
+
+        self.assertEqual(self.summary().paid_count, 1)
+        self.assertEqual(self.summary(self.sessions[0]).paid_revenue, 50)
+        registration.refresh_from_db()
+        self.assertEqual(registration.payment_status, 1)
+        # Unlike a save, the action does not sync the profile
+        self.assertEqual(registration.dojo, "Dojo at registration")
+
+    def test_new_session_gets_summary(self):
+        print("\ntest_new_session_gets_summary")
+        session = self.course.sessions.create(title="Session 2")
+        self.assertEqual(self.summary(session).participant_count, 0)
+
+    def test_deleted_course_is_skipped(self):
+        print("\ntest_deleted_course_is_skipped")
+        self.register("a@example.com", self.sessions)
+        self.course.delete()
+        self.assertFalse(CourseRegistrationSummary.objects.exists())
+
+    def test_rebuild_command(self):
+        print("\ntest_rebuild_command")
+        self.register("a@example.com", self.sessions)
+        CourseRegistrationSummary.objects.all().delete()
+
+        out = StringIO()
+        call_command("rebuild_registration_summaries", stdout=out)
+        self.assertIn("Rebuilt summaries of 1 courses.", out.getvalue())
+        self.assertEqual(self.summary().participant_count, 1)
+        self.assertEqual(
+            CourseRegistrationSummary.objects.filter(
+                session__isnull=False).count(), 2)
+
+
+class SessionOccupancyTest(TestCase):
+    """Tests for the occupancy counters of sessions"""
+
+    def setUp(self):
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today() + timedelta(days=10),
+            end_date=date.today() + timedelta(days=10),
+            registration_start_date=date.today(),
+            registration_end_date=date.today() + timedelta(days=5),
+        )
+        self.sessions = [
+            self.course.sessions.create(title=f"Session {i}", capacity=1)
+            for i in range(2)
+        ]
+        self.unlimited = self.course.sessions.create(title="Unlimited")
+
+    def occupancy(self):
+        return [
+            session.occupancy
+            for session in CourseSession.objects.filter(
+                course=self.course).order_by("pk")
+        ]
+
+    def register(self, email):
+        return CourseRegistration.objects.create(
+            course=self.course, email=email, accept_terms=True)
+
+    def test_occupancy_follows_selected_sessions(self):
+        print("\ntest_occupancy_follows_selected_sessions")
+        registration = self.register("a@example.com")
+        registration.selected_sessions.set(
+            [self.sessions[0], self.unlimited])
+        self.assertEqual(self.occupancy(), [1, 0, 1])
+
+        registration.selected_sessions.set([self.sessions[1]])
+        self.assertEqual(self.occupancy(), [0, 1, 0])
+
+        registration.delete()
+        self.assertEqual(self.occupancy(), [0, 0, 0])
+
+    def test_full_session_is_rejected(self):
+        print("\ntest_full_session_is_rejected")
+        self.register("a@example.com").selected_sessions.set(
+            [self.sessions[0]])
+        registration = self.register("b@example.com")
+        with self.assertRaises(ValidationError), transaction.atomic():
+            registration.selected_sessions.set(
+                [self.sessions[0], self.sessions[1]])
+        # The reservation of the second session is rolled back
+        self.assertEqual(self.occupancy(), [1, 0, 0])
+        self.assertFalse(registration.selected_sessions.exists())
+
+    def test_saving_session_keeps_occupancy(self):
+        print("\ntest_saving_session_keeps_occupancy")
+        session = CourseSession.objects.get(pk=self.sessions[0].pk)
+        self.register("a@example.com").selected_sessions.set([session])
+        session.capacity = 10
+        session.save()
+        session.refresh_from_db()
+        self.assertEqual(session.occupancy, 1)
+        self.assertEqual(session.capacity, 10)
+
+    def test_recount_occupancy(self):
+        print("\ntest_recount_occupancy")
+        self.register("a@example.com").selected_sessions.set(
+            [self.sessions[0], self.unlimited])
+        CourseSession.objects.update(occupancy=5)
+        self.assertEqual(CourseSession.objects.recount_occupancy(), 3)
+        self.assertEqual(self.occupancy(), [1, 0, 1])
+
+    def test_register_course_rejects_full_session(self):
+        print("\ntest_register_course_rejects_full_session")
+        self.register("a@example.com").selected_sessions.set(
+            [self.sessions[0]])
+        response = self.client.post(
+            reverse("register_course", args=[self.course.slug]),
+            {
+                "email": "b@example.com",
+                "first_name": "Guest",
+                "last_name": "User",
+                "dojo": "AAR",
+                "grade": constants.RED_BELT,
+                "payment_method": constants.BANK,
+                "accept_terms": True,
+                "selected_sessions": [self.sessions[0].pk, self.unlimited.pk],
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].non_field_errors())
+        self.assertFalse(CourseRegistration.objects.filter(
+            email="b@example.com").exists())
+        self.assertEqual(self.occupancy(), [1, 0, 0])
@@ -1,13 +1,10 @@
-import csv
 import os
 from datetime import date
-from smtplib import SMTPException
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.messages.views import SuccessMessageMixin
-from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse, HttpResponseRedirect
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.shortcuts import (HttpResponseRedirect, get_object_or_404,
                               redirect, render, reverse)
 from django.urls import reverse
@@ -18,7 +15,7 @@ from django.views import View
 from courses.models import InternalCourse
 from danbw_website import utils
 
-from . import forms
+from . import forms, services
 from .models import CourseRegistration, UserProfile
 
 
@@ -42,13 +39,11 @@ class RegisterCourse(View):
 
     def get(self, request, slug):
 
-        courses = InternalCourse.objects.filter(registration_status=1)
+        courses = InternalCourse.objects.with_effective_status()
         course = get_object_or_404(courses, slug=slug)
         course_data = self.prepare_course_data(course)
 
-        course.save()
-
-        if course.registration_status == 0:
+        if course.effective_registration_status == 0:
             messages.warning(
                 request,
                 _("Registration for this course is not possible at the moment.")
@@ -101,7 +96,8 @@ class RegisterCourse(View):
         )
 
     def post(self, request, slug):
-        queryset = InternalCourse.objects.filter(registration_status=1)
+        queryset = InternalCourse.objects.with_effective_status().filter(
+            effective_registration_status=1)
         course = get_object_or_404(queryset, slug=slug)
         course_data = self.prepare_course_data(course)
 
@@ -115,21 +111,6 @@ class RegisterCourse(View):
             )
 
         if registration_form.is_valid():
-            if not request.user.is_authenticated:
-                email = registration_form.cleaned_data.get("email")
-                if CourseRegistration.objects.filter(email=email, course=course).exists():
-                    registration_form.add_error("email", _(
-                        "A registration with this email address already exists."))
-                    return render(
-                        request,
-                        "register_course.html",
-                        {
-                            "course": course,
-                            "form": registration_form,
-                            "course_data": course_data,
-                        },
-                    )
-
             registration = registration_form.save(commit=False)
             registration.course = course
 
@@ -151,16 +132,14 @@ class RegisterCourse(View):
                 registration.last_name = registration_form.cleaned_data.get(
                     "last_name")
 
-            registration.save()
-
-            registration.selected_sessions.set(selected_sessions)
-
             try:
-                utils.send_registration_confirmation(request, registration)
-                utils.send_registration_notification(request, registration)
-            except SMTPException as e:
-                registration_form.add_error("email", e)
-                registration.delete()
+                services.save_registration(
+                    request, registration, selected_sessions)
+            except ValidationError as e:
+                if e.code == "duplicate" and not request.user.is_authenticated:
+                    registration_form.add_error("email", e)
+                else:
+                    registration_form.add_error(None, e)
                 return render(
                     request,
                     "register_course.html",
@@ -197,7 +176,7 @@ class CourseRegistrationList(LoginRequiredMixin, View):
     def get(self, request):
         user_registrations = CourseRegistration.objects.filter(
             user=request.user
-        )
+        ).select_related("course").prefetch_related("selected_sessions")
         past_registrations = [
             registration
             for registration in user_registrations
@@ -326,9 +305,20 @@ class UpdateCourseRegistration(LoginRequiredMixin, View):
             registration.final_fee = registration.calculate_fees(
                 course, selected_sessions)
             registration.set_exam(request.user)
-            registration.save()
-
-            registration.selected_sessions.set(selected_sessions)
+            try:
+                services.save_registration(
+                    request, registration, selected_sessions)
+            except ValidationError as e:
+                registration_form.add_error(None, e)
+                return render(
+                    request,
+                    "update_courseregistration.html",
+                    {
+                        "course": course,
+                        "form": registration_form,
+                        "course_data": course_data,
+                    },
+                )
 
             messages.info(
                 request,
@@ -382,13 +372,8 @@ class ExportCourseRegistrations(LoginRequiredMixin, UserPassesTestMixin, View):
                 return HttpResponseRedirect(reverse("home"))
 
             filename = f"csv_export_{slugify(slug)}_{date.today()}.csv"
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename={filename}'
-
-            writer = csv.writer(response)
-            utils.write_registrations_csv(writer, queryset)
-
-            return response
+            return utils.csv_response(
+                filename, utils.write_registrations_csv, queryset)
         else:
             messages.error(request, _("Invalid request method."))
             return HttpResponseRedirect(reverse("home"))
@@ -1,10 +1,13 @@
 import csv
-import tempfile
-import zipfile
 from datetime import date
 
 from django.contrib import admin
-from django.http import HttpResponse
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from django_summernote.admin import SummernoteModelAdmin
@@ -14,6 +17,9 @@ from danbw_website import utils
 
 from .models import CourseSession, ExternalCourse, InternalCourse
 
+# Number of registrations per page in the registrations panel
+REGISTRATIONS_PER_PAGE = 50
+
 
 class CoursesByYearFilter(admin.SimpleListFilter):
     """Filter for displaying courses by year"""
@@ -31,6 +37,33 @@ class CoursesByYearFilter(admin.SimpleListFilter):
         return queryset
 
 
+class EffectiveStatusFilter(admin.SimpleListFilter):
+    """Filter for the status as derived from the course dates, which is
+    also the status displayed in the changelist"""
+
+    title = _("Status")
+    parameter_name = "status"
+    field_name = "effective_status"
+    status_choices = InternalCourse.STATUS_CHOICES
+
+    def lookups(self, request, model_admin):
+        return self.status_choices
+
+    def queryset(self, request, queryset):
+        if self.value() is not None:
+            return queryset.filter(**{self.field_name: self.value()})
+        return queryset
+
+
+class EffectiveRegistrationStatusFilter(EffectiveStatusFilter):
+    """Filter for the registration status as derived from the course dates"""
+
+    title = _("Registration Status")
+    parameter_name = "registration_status"
+    field_name = "effective_registration_status"
+    status_choices = InternalCourse.REGISTRATION_STATUS
+
+
 class FutureCourseFilter(admin.SimpleListFilter):
     """Filter for future and past courses
     https://docs.djangoproject.com/en/5.0/ref/contrib/admin/filters/
@@ -61,47 +94,7 @@ class CourseSessionInline(admin.TabularInline):
 
     model = CourseSession
     extra = 0  # Set number of additional rows to 0
-
-
-class CourseRegistrationInline(admin.TabularInline):
-    """Displays CourseRegistrations as an inline model"""
-
-    model = CourseRegistration
-    extra = 0  # Set number of additional rows to 0
-    max_num = 0  # Hide option to add more rows
-    fields = [
-        "first_name",
-        "last_name",
-        "email",
-        "grade",
-        "dojo",
-        "truncated_session_display",
-        "final_fee",
-        "payment_status",
-        "payment_method",
-        "discount",
-        "exam",
-        "truncated_comment",
-        "accept_terms",
-        "dinner",
-        "overnight_stay",
-    ]
-    readonly_fields = [
-        "first_name",
-        "last_name",
-        "email",
-        "truncated_session_display",
-        "exam",
-        "accept_terms",
-        "final_fee",
-        "payment_method",
-        "discount",
-        "truncated_comment",
-        "dinner",
-        "overnight_stay",
-        "grade",
-        "dojo",
-    ]
+    readonly_fields = ["occupancy"]
 
 
 @admin.register(InternalCourse)
@@ -145,26 +138,34 @@ class InternalCourseAdmin(SummernoteModelAdmin):
                 "additional_info",
             )
         }),
+        (_("Registrations"), {
+            "fields": (
+                "registrations_panel",
+            )
+        }),
     )
 
-    readonly_fields = ("slug",)
+    readonly_fields = ("slug", "registrations_panel")
 
     list_display = (
         "title",
-        "status",
+        "get_status",
         "publication_date",
-        "registration_status",
+        "get_registration_status",
         "start_date",
         "end_date",
         "course_fee",
         "course_fee_cash",
         "get_course_registration_count",
+        "get_paid_count",
+        "get_unpaid_count",
+        "get_exam_count",
     )
     search_fields = ["title", "description"]
-    list_filter = (CoursesByYearFilter, FutureCourseFilter,
-                   "course_type", "status", "registration_status")
+    list_filter = (CoursesByYearFilter, FutureCourseFilter, "course_type",
+                   EffectiveStatusFilter, EffectiveRegistrationStatusFilter)
     summernote_fields = ("description",)
-    inlines = [CourseSessionInline, CourseRegistrationInline]
+    inlines = [CourseSessionInline]
     ordering = ["-start_date"]
     actions = [
         "duplicate_selected_courses",
@@ -173,6 +174,84 @@ class InternalCourseAdmin(SummernoteModelAdmin):
         "export_csv"
     ]
 
+    class Media:
+        js = ("js/admin_registrations.js",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(
+            request).with_effective_status().with_registration_counts()
+
+    def get_urls(self):
+        urls = [
+            path(
+                "<int:pk>/registrations/",
+                self.admin_site.admin_view(self.registrations_view),
+                name="courses_internalcourse_registrations",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def registrations_view(self, request, pk):
+        """Renders one page of the registrations of a course, loaded on
+        demand by the registrations panel of the change form"""
+        course = get_object_or_404(InternalCourse, pk=pk)
+        if not (self.has_view_permission(request, course) and
+                request.user.has_perm(
+                    "course_registrations.view_courseregistration")):
+            raise PermissionDenied
+        registrations = CourseRegistration.objects.filter(
+            course=course).with_sessions().order_by("-registration_date")
+        page = Paginator(registrations, REGISTRATIONS_PER_PAGE).get_page(
+            request.GET.get("page"))
+        return TemplateResponse(request, "admin/courses/registrations_panel.html", {
+            "course": course,
+            "page": page,
+        })
+
+    def registrations_panel(self, course):
+        """Shows the registration counts of a course and a panel loading
+        the registrations when it is opened"""
+        if not course.pk:
+            return "-"
+        changelist_url = reverse(
+            "admin:course_registrations_courseregistration_changelist")
+        return format_html(
+            '<p>{}: {} &middot; {}: {} &middot; {}: {} &middot; {}: {} '
+            '&middot; <a href="{}?course={}">{}</a></p>'
+            '<details class="registrations-panel" data-url="{}" '
+            'data-error="{}"><summary>{}</summary>'
+            '<div class="registrations-panel-content"></div></details>',
+            _("Registrations"), course.registration_count,
+            _("Paid"), course.paid_count,
+            _("Unpaid"), course.unpaid_count,
+            _("Exams"), course.exam_count,
+            changelist_url, course.pk, _("Open in registration list"),
+            reverse("admin:courses_internalcourse_registrations",
+                    args=[course.pk]),
+            _("The registrations could not be loaded."),
+            _("Show registrations"),
+        )
+
+    registrations_panel.short_description = _("Registrations")
+
+    def get_status(self, course):
+        """Gets the course status as derived from the course dates"""
+        return utils.get_tuple_value(
+            InternalCourse.STATUS_CHOICES, course.effective_status)
+
+    get_status.short_description = _("Status")
+    get_status.admin_order_field = "effective_status"
+
+    def get_registration_status(self, course):
+        """Gets the registration status as derived from the course dates"""
+        return utils.get_tuple_value(
+            InternalCourse.REGISTRATION_STATUS,
+            course.effective_registration_status,
+        )
+
+    get_registration_status.short_description = _("Registration Status")
+    get_registration_status.admin_order_field = "effective_registration_status"
+
     def duplicate_selected_courses(self, request, queryset):
         """Action for duplicating existing courses"""
         for course in queryset:
@@ -210,80 +289,89 @@ class InternalCourseAdmin(SummernoteModelAdmin):
                     start_time=session.start_time,
                     end_time=session.end_time,
                     session_fee=session.session_fee,
+                    capacity=session.capacity,
                 )
 
     duplicate_selected_courses.short_description = _(
         "Duplicate selected courses")
 
     def toggle_registration_status(self, request, queryset):
-        """Action for toggling course registration status"""
-        for course in queryset:
-            course.registration_status = not course.registration_status
-            course.save()
+        """Action for toggling course registration status. Like save(),
+        the status derived from the course dates is applied afterwards."""
+        updated = queryset.toggle_registration_status()
+        queryset.update_status()
+        utils.report_updated(self, request, updated)
 
     toggle_registration_status.short_description = _(
         "Toggle registration status of selected courses")
 
     def toggle_status(self, request, queryset):
-        """Action for toggling course status"""
-        for course in queryset:
-            course.status = not course.status
-            course.save()
+        """Action for toggling course status. Like save(), the status
+        derived from the course dates is applied afterwards."""
+        updated = queryset.toggle_status()
+        queryset.update_status()
+        utils.report_updated(self, request, updated)
 
     toggle_status.short_description = _("Toggle status of selected courses")
 
     def get_course_registration_count(self, course):
         """Gets the number of registrations for a course"""
-
-        registrations = CourseRegistration.objects.filter(course=course)
-
-        return len(registrations)
+        return course.registration_count
 
     # Customize property name: https://stackoverflow.com/a/64352815
     get_course_registration_count.short_description = _("Registrations")
+    get_course_registration_count.admin_order_field = "registration_count"
+
+    def get_paid_count(self, course):
+        """Gets the number of paid registrations for a course"""
+        return course.paid_count
+
+    get_paid_count.short_description = _("Paid")
+    get_paid_count.admin_order_field = "paid_count"
+
+    def get_unpaid_count(self, course):
+        """Gets the number of unpaid registrations for a course"""
+        return course.unpaid_count
+
+    get_unpaid_count.short_description = _("Unpaid")
+    get_unpaid_count.admin_order_field = "unpaid_count"
+
+    def get_exam_count(self, course):
+        """Gets the number of exam candidates of a course"""
+        return course.exam_count
+
+    get_exam_count.short_description = _("Exams")
+    get_exam_count.admin_order_field = "exam_count"
 
     def export_csv(self, request, queryset):
         """Action for exporting course registrations to CSV or zip"""
 
         if queryset.count() == 1:
             course = queryset.first()
-            response = HttpResponse(content_type="text/csv")
-            response["Content-Disposition"] = (
-                f"attachment; filename={slugify(course.title)}_{_('registrations')}.csv"
-            )
-            writer = csv.writer(response)
-
             registrations = CourseRegistration.objects.filter(course=course)
 
-            utils.write_registrations_csv(writer, registrations)
-
-            return response
-
-        zip_buffer = tempfile.TemporaryFile()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-            for course in queryset:
-                csv_filename = f"{slugify(course.title)}_{_('registrations')}.csv"
-
-                registrations = CourseRegistration.objects.filter(
-                    course=course)
+            return utils.csv_response(
+                f"{slugify(course.title)}_{_('registrations')}.csv",
+                utils.write_registrations_csv,
+                registrations,
+            )
 
-                with tempfile.NamedTemporaryFile(
-                    delete=False, mode="w", newline=""
-                ) as csv_file:
-                    writer = csv.writer(csv_file)
-                    utils.write_registrations_csv(
-                        writer, registrations)
-                zip_file.write(csv_file.name, arcname=csv_filename)
-        zip_buffer.seek(0)
+        # The CSV files are generated while the archive is streamed
+        writer = csv.writer(utils.Echo())
+        files = [
+            (
+                f"{slugify(course.title)}_{_('registrations')}.csv",
+                utils.write_registrations_csv(
+                    writer, CourseRegistration.objects.filter(course=course)),
+            )
+            for course in queryset
+        ]
 
-        response = HttpResponse(
-            zip_buffer.read(), content_type="application/zip")
-        response["Content-Disposition"] = (
-            f"attachment; filename={slugify(_('course_registrations'))}_{slugify(date.today())}.zip"
+        return utils.zip_response(
+            f"{slugify(_('course_registrations'))}_{slugify(date.today())}.zip",
+            files,
         )
 
-        return response
-
     export_csv.short_description = _(
         "Export selected course registrations to CSV")
 
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import InternalCourse
+from danbw_website import utils
+
+
+class Command(BaseCommand):
+    help = "Sends an email to all participants of a course"
+
+    def add_arguments(self, parser):
+        parser.add_argument("slug", help="Slug of the course")
+        parser.add_argument("--subject", required=True)
+        parser.add_argument(
+            "--message-file",
+            required=True,
+            help="Path of a text file containing the message",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            course = InternalCourse.objects.get(slug=options["slug"])
+        except InternalCourse.DoesNotExist:
+            raise CommandError(f"Course {options['slug']} does not exist.")
+
+        with open(options["message_file"], encoding="utf-8") as f:
+            message = f.read()
+
+        emails = utils.course_participants_messages(
+            course, options["subject"], message)
+        failed = utils.deliver(*emails)
+        for email in failed:
+            self.stderr.write(f"Failed to send email to {', '.join(email.to)}.")
+        self.stdout.write(f"Sent {len(emails) - len(failed)} emails.")
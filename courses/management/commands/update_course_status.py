@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import InternalCourse
+from courses.scheduler import CourseStatusScheduler
+
+
+class Command(BaseCommand):
+    help = "Updates registration and publication status of internal courses"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and apply transitions when they are due",
+        )
+        parser.add_argument(
+            "--max-interval",
+            type=int,
+            default=3600,
+            help="Maximum number of seconds between two runs in loop mode",
+        )
+
+    def handle(self, *args, **options):
+        if options["loop"]:
+            scheduler = CourseStatusScheduler(
+                max_interval=options["max_interval"])
+            try:
+                scheduler.run()
+            except KeyboardInterrupt:
+                scheduler.stop()
+            return
+
+        updated = InternalCourse.objects.update_status()
+        self.stdout.write(f"Updated status of {updated} courses.")
+
+        next_transition = InternalCourse.objects.next_transition_date()
+        if next_transition:
+            self.stdout.write(f"Next transition: {next_transition}")
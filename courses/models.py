@@ -1,12 +1,43 @@
 import re
-from datetime import date
+from datetime import date, timedelta
 
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import (Case, Count, F, Min, OuterRef, Q, Subquery,
+                              When)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
 from danbw_website import constants
+from danbw_website.utils import toggle_expression
+
+
+class CourseQuerySet(models.QuerySet):
+    """Custom queryset for listing internal and external courses together"""
+
+    def timeline(self, start=None, end=None):
+        """Filters courses ending within the given date window"""
+        queryset = self
+        if start:
+            queryset = queryset.filter(end_date__gte=start)
+        if end:
+            queryset = queryset.filter(end_date__lte=end)
+        return queryset
+
+    def as_subclasses(self):
+        """Returns the courses as InternalCourse and ExternalCourse
+        instances in the order of the queryset. Each subclass is loaded
+        with a single query, the sessions of the internal courses with
+        one more."""
+        pks = list(self.values_list("pk", flat=True))
+        courses = {
+            **InternalCourse.objects.with_effective_status()
+            .prefetch_related("sessions").in_bulk(pks),
+            **ExternalCourse.objects.in_bulk(pks),
+        }
+        return [courses[pk] for pk in pks if pk in courses]
 
 
 class Course(models.Model):
@@ -33,9 +64,21 @@ class Course(models.Model):
         max_length=200,
         blank=True,
     )
+    updated = models.DateTimeField(
+        _("Last Modified"),
+        auto_now=True,
+    )
+
+    objects = CourseQuerySet.as_manager()
 
     class Meta:
         ordering = ["start_date"]
+        indexes = [
+            # Course timeline and the ended courses in status updates
+            models.Index(fields=["end_date"], name="course_end_date_idx"),
+            # Ordering and filtering courses by year
+            models.Index(fields=["start_date"], name="course_start_date_idx"),
+        ]
         verbose_name = _("Course")
         verbose_name_plural = _("Courses")
 
@@ -71,6 +114,137 @@ class Course(models.Model):
         super().save(*args, **kwargs)
 
 
+def _registration_status_expression(today):
+    """Registration status derived from the registration dates. Courses
+    without registration dates keep their manually set status."""
+    has_dates = (
+        Q(registration_start_date__isnull=False) |
+        Q(registration_end_date__isnull=False)
+    )
+    is_open = (
+        (Q(registration_start_date__isnull=True) |
+         Q(registration_start_date__lte=today)) &
+        (Q(registration_end_date__isnull=True) |
+         Q(registration_end_date__gte=today))
+    )
+    return Case(
+        When(has_dates & is_open, then=1),
+        When(has_dates, then=0),
+        default=F("registration_status"),
+    )
+
+
+def _status_expression(today):
+    """Publication status derived from the publication and end dates.
+    The end date is looked up through the parent table, so the expression
+    can also be used in an UPDATE of the internal course table."""
+    ended = Q(pk__in=Course.objects.filter(
+        end_date__lt=today).values("pk"))
+    return Case(
+        When(ended, then=0),
+        When(publication_date__lte=today, then=1),
+        default=F("status"),
+    )
+
+
+class InternalCourseQuerySet(CourseQuerySet):
+    """Custom queryset for date-driven status handling of internal courses"""
+
+    def with_effective_status(self, today=None):
+        """Annotates the registration and publication status as derived
+        from the course dates, regardless of when the stored status was
+        last updated"""
+        today = today or date.today()
+        return self.annotate(
+            effective_registration_status=_registration_status_expression(
+                today),
+            effective_status=_status_expression(today),
+        )
+
+    def with_registration_counts(self):
+        """Annotates the number of registrations, paid and unpaid
+        registrations and exam registrations in a single aggregate query"""
+        return self.annotate(
+            registration_count=Count("courseregistration"),
+            paid_count=Count(
+                "courseregistration",
+                filter=Q(courseregistration__payment_status=1),
+            ),
+            unpaid_count=Count(
+                "courseregistration",
+                filter=Q(courseregistration__payment_status=0),
+            ),
+            exam_count=Count(
+                "courseregistration",
+                filter=Q(courseregistration__exam=True),
+            ),
+        )
+
+    def update_status(self, today=None):
+        """Applies all due status transitions in a single UPDATE and
+        returns the number of changed courses"""
+        today = today or date.today()
+        registration_status = _registration_status_expression(today)
+        status = _status_expression(today)
+        return self.exclude(
+            registration_status=registration_status, status=status
+        ).update(registration_status=registration_status, status=status)
+
+    def toggle_registration_status(self):
+        """Toggles the registration status in a single UPDATE. Courses with
+        registration dates are skipped, as their registration status is
+        derived from the dates. Returns the number of changed courses."""
+        return self.filter(
+            registration_start_date__isnull=True,
+            registration_end_date__isnull=True,
+        ).update(
+            registration_status=toggle_expression(
+                self.model, "registration_status"),
+            updated=timezone.now(),
+        )
+
+    def toggle_status(self, today=None):
+        """Toggles the status in a single UPDATE. Courses which are
+        published by their publication date or have ended are skipped, as
+        their status is derived from the dates. Returns the number of
+        changed courses."""
+        today = today or date.today()
+        return self.exclude(publication_date__lte=today).filter(
+            end_date__gte=today,
+        ).update(
+            status=toggle_expression(self.model, "status"),
+            updated=timezone.now(),
+        )
+
+    def next_transition_date(self, today=None):
+        """Returns the next date after today on which the status of a
+        course changes, or None if no transition is pending"""
+        today = today or date.today()
+        dates = self.aggregate(
+            registration_start=Min(
+                "registration_start_date",
+                filter=Q(registration_start_date__gt=today),
+            ),
+            registration_end=Min(
+                "registration_end_date",
+                filter=Q(registration_end_date__gte=today),
+            ),
+            publication=Min(
+                "publication_date",
+                filter=Q(publication_date__gt=today),
+            ),
+            end=Min("end_date", filter=Q(end_date__gte=today)),
+        )
+        # Registration and course end take effect on the following day
+        candidates = [
+            dates["registration_start"],
+            dates["publication"],
+            dates["registration_end"] and dates["registration_end"] + timedelta(days=1),
+            dates["end"] and dates["end"] + timedelta(days=1),
+        ]
+        return min(filter(None, candidates), default=None)
+
+
 class InternalCourse(Course):
     """Represents a course organized by the organization"""
 
@@ -176,6 +350,8 @@ class InternalCourse(Course):
         blank=True,
     )
 
+    objects = InternalCourseQuerySet.as_manager()
+
     def clean(self):
         """Custom validation for Internal Course model"""
         super().clean()
@@ -227,6 +403,38 @@ class ExternalCourse(Course):
         verbose_name_plural = _("External Courses")
 
 
+class CourseSessionQuerySet(models.QuerySet):
+    """Custom queryset for the occupancy counters of sessions"""
+
+    def with_free_places(self):
+        """Filters sessions without capacity or with free places"""
+        return self.filter(
+            Q(capacity__isnull=True) | Q(occupancy__lt=F("capacity")))
+
+    def reserve(self):
+        """Takes a place in each session with a single conditional UPDATE.
+        Only the updated rows are locked, and a full session is never
+        updated, so concurrent registrations cannot overbook it.
+        Returns the number of reserved sessions."""
+        return self.with_free_places().update(occupancy=F("occupancy") + 1)
+
+    def release(self):
+        """Frees a place in each session"""
+        return self.filter(occupancy__gt=0).update(
+            occupancy=F("occupancy") - 1)
+
+    def recount_occupancy(self):
+        """Recomputes the occupancy from the selected sessions of all
+        registrations and returns the number of updated sessions"""
+        Through = self.model.courseregistration_set.through
+        registrations = Through.objects.filter(
+            coursesession=OuterRef("pk")
+        ).order_by().values("coursesession").annotate(
+            count=Count("pk")).values("count")
+        return self.update(
+            occupancy=Coalesce(Subquery(registrations), 0))
+
+
 class CourseSession(models.Model):
     """Represents a session within a course"""
 
@@ -264,6 +472,19 @@ class CourseSession(models.Model):
         _("Dan Preparation"),
         default=False,
     )
+    capacity = models.PositiveIntegerField(
+        _("Capacity"),
+        blank=True,
+        null=True,
+        help_text=_("Maximum number of participants, unlimited if empty"),
+    )
+    occupancy = models.PositiveIntegerField(
+        _("Occupancy"),
+        default=0,
+        editable=False,
+    )
+
+    objects = CourseSessionQuerySet.as_manager()
 
     def __str__(self):
         return f"{constants.WEEKDAYS[self.date.weekday()][1]}, {self.date.strftime('%d.%m.%Y')}, {self.start_time.strftime('%H:%M')}-{self.end_time.strftime('%H:%M')}: {self.title}"
@@ -273,6 +494,20 @@ class CourseSession(models.Model):
             raise ValidationError(
                 _("Start time cannot be later than end time."))
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # The occupancy is only changed by the counter updates, saving a
+            # stale value would overwrite concurrent registrations
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "occupancy"
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def is_full(self):
+        return self.capacity is not None and self.occupancy >= self.capacity
+
     class Meta:
         verbose_name = _("Course Session")
         verbose_name_plural = _("Course Sessions")
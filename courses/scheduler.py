@@ -0,0 +1,49 @@
+import logging
+import threading
+from datetime import datetime, time
+
+from django.db import DatabaseError, close_old_connections
+
+from .models import InternalCourse
+
+logger = logging.getLogger(__name__)
+
+
+class CourseStatusScheduler(threading.Thread):
+    """Applies course status transitions in the background.
+    The scheduler sleeps until the next transition date, but wakes up at
+    least every max_interval seconds to pick up newly created courses.
+    """
+
+    def __init__(self, max_interval=3600):
+        super().__init__(name="course-status-scheduler", daemon=True)
+        self.max_interval = max_interval
+        self.stop_event = threading.Event()
+
+    def run_once(self):
+        """Updates the course statuses and returns the next transition date"""
+        try:
+            updated = InternalCourse.objects.update_status()
+            if updated:
+                logger.info("Updated status of %s courses", updated)
+            return InternalCourse.objects.next_transition_date()
+        except DatabaseError:
+            logger.exception("Failed to update course status")
+            return None
+
+    def get_wait_seconds(self, next_transition):
+        if next_transition is None:
+            return self.max_interval
+        seconds = (
+            datetime.combine(next_transition, time.min) - datetime.now()
+        ).total_seconds()
+        return max(1, min(seconds, self.max_interval))
+
+    def run(self):
+        while not self.stop_event.is_set():
+            next_transition = self.run_once()
+            close_old_connections()
+            self.stop_event.wait(self.get_wait_seconds(next_transition))
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Course, CourseSession
+
+
+# Cached course list fragments are keyed on Course.updated, which changes
+# whenever an internal or external course is saved. Session changes need
+# to mark their course as modified explicitly.
+@receiver([post_save, post_delete], sender=CourseSession)
+def course_session_changed(sender, instance, **kwargs):
+    Course.objects.filter(pk=instance.course_id).update(
+        updated=timezone.now())
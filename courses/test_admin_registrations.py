@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.urls import reverse
+
+from users.models import User
+
+from .models import InternalCourse
+
+
+class RegistrationsViewTest(TestCase):
+    """Tests for the registrations panel of the internal course admin"""
+
+    def setUp(self):
+        self.course = InternalCourse.objects.create(
+            title="Test course", start_date=date.today(),
+            end_date=date.today())
+        self.user = User.objects.create_user(
+            username="staff", email="staff@example.com", is_staff=True)
+        self.user.user_permissions.add(
+            Permission.objects.get(codename="view_internalcourse"))
+        self.client.force_login(self.user)
+        self.url = reverse(
+            "admin:courses_internalcourse_registrations",
+            args=[self.course.pk])
+
+    def test_requires_registration_permission(self):
+        print("\ntest_requires_registration_permission")
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        self.user.user_permissions.add(
+            Permission.objects.get(codename="view_courseregistration"))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
@@ -0,0 +1,100 @@
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from course_registrations.models import CourseRegistration
+from users.models import User, UserProfile
+
+from .models import InternalCourse
+from .scheduler import CourseStatusScheduler
+
+
+class UpdateCourseStatusCommandTest(TestCase):
+    """Tests for the update_course_status management command"""
+
+    def setUp(self):
+        today = date.today()
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=today + timedelta(days=10),
+            end_date=today + timedelta(days=10),
+            registration_start_date=today,
+            registration_end_date=today + timedelta(days=5),
+        )
+        InternalCourse.objects.update(registration_status=0)
+
+    def test_command_updates_status(self):
+        print("\ntest_command_updates_status")
+        out = StringIO()
+        call_command("update_course_status", stdout=out)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.registration_status, 1)
+        self.assertIn("Updated status of 1 courses.", out.getvalue())
+        self.assertIn(
+            f"Next transition: {date.today() + timedelta(days=6)}",
+            out.getvalue(),
+        )
+
+
+class CourseStatusSchedulerTest(TestCase):
+    """Tests for the CourseStatusScheduler"""
+
+    def test_run_once_returns_next_transition(self):
+        print("\ntest_run_once_returns_next_transition")
+        today = date.today()
+        InternalCourse.objects.create(
+            title="Test course",
+            start_date=today + timedelta(days=2),
+            end_date=today + timedelta(days=2),
+        )
+        scheduler = CourseStatusScheduler()
+        self.assertEqual(scheduler.run_once(), today + timedelta(days=3))
+
+    def test_wait_is_limited_by_max_interval(self):
+        print("\ntest_wait_is_limited_by_max_interval")
+        scheduler = CourseStatusScheduler(max_interval=60)
+        self.assertEqual(scheduler.get_wait_seconds(None), 60)
+        self.assertEqual(
+            scheduler.get_wait_seconds(date.today() + timedelta(days=2)), 60)
+        self.assertEqual(scheduler.get_wait_seconds(date.today()), 1)
+
+
+class EmailCourseParticipantsCommandTest(TestCase):
+    """Tests for the email_course_participants management command"""
+
+    def test_command_sends_one_email_per_participant(self):
+        print("\ntest_command_sends_one_email_per_participant")
+        course = InternalCourse.objects.create(
+            title="Test course",
+            slug="test-course",
+            start_date=date.today(),
+            end_date=date.today(),
+        )
+        user = User.objects.create_user(
+            username="test-user", email="c@example.com", password="test")
+        UserProfile.objects.create(user=user)
+        CourseRegistration.objects.create(
+            course=course, user=user, accept_terms=True)
+        for email in ["a@example.com", "b@example.com"]:
+            CourseRegistration.objects.create(
+                course=course, email=email, accept_terms=True)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as f:
+            f.write("Course update")
+            f.flush()
+            out = StringIO()
+            call_command(
+                "email_course_participants", "test-course",
+                subject="Update", message_file=f.name, stdout=out,
+            )
+
+        self.assertEqual(
+            [email.to for email in mail.outbox],
+            [["a@example.com"], ["b@example.com"], ["c@example.com"]],
+        )
+        self.assertEqual(mail.outbox[0].body, "Course update")
+        self.assertIn("Sent 3 emails.", out.getvalue())
@@ -3,7 +3,10 @@ from datetime import date, datetime, time, timedelta
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-from .models import Course, CourseSession
+from course_registrations.models import CourseRegistration
+
+from .models import (Course, CourseSession, ExternalCourse,
+                     InternalCourse)
 
 
 class TestCourseModel(TestCase):
@@ -84,3 +87,183 @@ class TestCourseSessionModel(TestCase):
         print("\ntest_session_custom_date_validation")
         session = CourseSession.objects.get(title="Invalid session")
         self.assertRaises(ValidationError, session.clean)
+
+
+class TestInternalCourseQuerySet(TestCase):
+    """Tests for the InternalCourseQuerySet"""
+
+    def setUp(self):
+        today = date.today()
+        self.open_course = InternalCourse.objects.create(
+            title="Open course",
+            start_date=today + timedelta(days=10),
+            end_date=today + timedelta(days=11),
+            publication_date=today - timedelta(days=1),
+            registration_start_date=today - timedelta(days=1),
+            registration_end_date=today + timedelta(days=5),
+        )
+        self.past_course = InternalCourse.objects.create(
+            title="Past course",
+            start_date=today - timedelta(days=3),
+            end_date=today - timedelta(days=2),
+            registration_start_date=today - timedelta(days=10),
+            registration_end_date=today - timedelta(days=5),
+        )
+        self.manual_course = InternalCourse.objects.create(
+            title="Manual course",
+            start_date=today + timedelta(days=20),
+            end_date=today + timedelta(days=20),
+            registration_status=1,
+        )
+        # Simulate statuses that have not been updated since creation
+        InternalCourse.objects.update(registration_status=0, status=1)
+        InternalCourse.objects.filter(pk=self.manual_course.pk).update(
+            registration_status=1, status=0)
+
+    def test_update_status_applies_transitions(self):
+        print("\ntest_update_status_applies_transitions")
+        with self.assertNumQueries(1):
+            updated = InternalCourse.objects.update_status()
+        self.assertEqual(updated, 2)
+
+        self.open_course.refresh_from_db()
+        self.past_course.refresh_from_db()
+        self.manual_course.refresh_from_db()
+        self.assertEqual(self.open_course.registration_status, 1)
+        self.assertEqual(self.open_course.status, 1)
+        self.assertEqual(self.past_course.registration_status, 0)
+        self.assertEqual(self.past_course.status, 0)
+        self.assertEqual(self.manual_course.registration_status, 1)
+        self.assertEqual(self.manual_course.status, 0)
+
+    def test_update_status_is_idempotent(self):
+        print("\ntest_update_status_is_idempotent")
+        InternalCourse.objects.update_status()
+        self.assertEqual(InternalCourse.objects.update_status(), 0)
+
+    def test_next_transition_date(self):
+        print("\ntest_next_transition_date")
+        today = date.today()
+        self.assertEqual(
+            InternalCourse.objects.next_transition_date(),
+            today + timedelta(days=6),
+        )
+        self.assertIsNone(
+            InternalCourse.objects.filter(
+                pk=self.past_course.pk).next_transition_date()
+        )
+
+    def test_with_effective_status(self):
+        print("\ntest_with_effective_status")
+        courses = {
+            course.pk: course
+            for course in InternalCourse.objects.with_effective_status()
+        }
+        open_course = courses[self.open_course.pk]
+        past_course = courses[self.past_course.pk]
+        manual_course = courses[self.manual_course.pk]
+        self.assertEqual(open_course.effective_registration_status, 1)
+        self.assertEqual(open_course.effective_status, 1)
+        self.assertEqual(past_course.effective_registration_status, 0)
+        self.assertEqual(past_course.effective_status, 0)
+        self.assertEqual(manual_course.effective_registration_status, 1)
+        self.assertEqual(manual_course.effective_status, 0)
+        # The stored status is left untouched
+        self.assertEqual(open_course.registration_status, 0)
+
+    def test_toggle_registration_status(self):
+        print("\ntest_toggle_registration_status")
+        updated = InternalCourse.objects.toggle_registration_status()
+        # Only the course without registration dates is toggled
+        self.assertEqual(updated, 1)
+        self.manual_course.refresh_from_db()
+        self.open_course.refresh_from_db()
+        self.assertEqual(self.manual_course.registration_status, 0)
+        self.assertEqual(self.open_course.registration_status, 0)
+        self.assertGreater(self.manual_course.updated, self.open_course.updated)
+
+    def test_toggle_status(self):
+        print("\ntest_toggle_status")
+        updated = InternalCourse.objects.toggle_status()
+        # Published and past courses are skipped
+        self.assertEqual(updated, 1)
+        self.manual_course.refresh_from_db()
+        self.past_course.refresh_from_db()
+        self.assertEqual(self.manual_course.status, 1)
+        self.assertEqual(self.past_course.status, 1)
+
+    def test_with_registration_counts(self):
+        print("\ntest_with_registration_counts")
+        for i, (payment_status, exam) in enumerate(
+                [(1, False), (0, True), (0, False)]):
+            CourseRegistration.objects.create(
+                course=self.open_course,
+                email=f"guest{i}@example.com",
+                accept_terms=True,
+                payment_status=payment_status,
+                exam=exam,
+            )
+        with self.assertNumQueries(1):
+            courses = {
+                course.pk: course
+                for course in InternalCourse.objects.with_registration_counts()
+            }
+        open_course = courses[self.open_course.pk]
+        self.assertEqual(open_course.registration_count, 3)
+        self.assertEqual(open_course.paid_count, 1)
+        self.assertEqual(open_course.unpaid_count, 2)
+        self.assertEqual(open_course.exam_count, 1)
+        self.assertEqual(courses[self.past_course.pk].registration_count, 0)
+
+
+class TestCourseQuerySet(TestCase):
+    """Tests for the CourseQuerySet"""
+
+    def setUp(self):
+        today = date.today()
+        self.past_course = InternalCourse.objects.create(
+            title="Past course",
+            start_date=today - timedelta(days=10),
+            end_date=today - timedelta(days=9),
+        )
+        self.internal_course = InternalCourse.objects.create(
+            title="Internal course",
+            start_date=today + timedelta(days=20),
+            end_date=today + timedelta(days=21),
+        )
+        self.external_course = ExternalCourse.objects.create(
+            title="External course",
+            start_date=today + timedelta(days=10),
+            end_date=today + timedelta(days=10),
+        )
+        self.distant_course = ExternalCourse.objects.create(
+            title="Distant course",
+            start_date=today + timedelta(days=200),
+            end_date=today + timedelta(days=200),
+        )
+
+    def test_timeline_filters_date_window(self):
+        print("\ntest_timeline_filters_date_window")
+        today = date.today()
+        courses = Course.objects.timeline(
+            start=today, end=today + timedelta(days=90))
+        self.assertQuerySetEqual(
+            courses,
+            [self.external_course.pk, self.internal_course.pk],
+            transform=lambda course: course.pk,
+        )
+
+    def test_as_subclasses(self):
+        print("\ntest_as_subclasses")
+        with self.assertNumQueries(4):
+            courses = Course.objects.order_by("-start_date").as_subclasses()
+        self.assertEqual(
+            [course.title for course in courses],
+            ["Distant course", "Internal course",
+             "External course", "Past course"],
+        )
+        self.assertIsInstance(courses[1], InternalCourse)
+        self.assertIsInstance(courses[2], ExternalCourse)
+        self.assertEqual(courses[1].effective_registration_status, 0)
+        with self.assertNumQueries(0):
+            list(courses[1].sessions.all())
@@ -0,0 +1,56 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+
+from .models import CourseSession, InternalCourse
+
+
+# Query counts assume a cache that does not use the database
+@override_settings(CACHES={"default": settings.CACHE_BACKENDS["locmem"]})
+class CourseSessionSignalTest(TestCase):
+    """Tests for invalidating cached course list items"""
+
+    def setUp(self):
+        cache.clear()
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today(),
+            end_date=date.today(),
+        )
+        self.session = CourseSession.objects.create(
+            title="Morning session",
+            course=self.course,
+        )
+
+    def render_course(self):
+        course = InternalCourse.objects.with_effective_status().get(
+            pk=self.course.pk)
+        return render_to_string(
+            "course_list_item.html",
+            {"course": course, "year": course.start_date.year},
+        )
+
+    def test_course_list_item_is_cached(self):
+        print("\ntest_course_list_item_is_cached")
+        self.render_course()
+        course = InternalCourse.objects.with_effective_status().get(
+            pk=self.course.pk)
+        with self.assertNumQueries(0):
+            html = render_to_string(
+                "course_list_item.html",
+                {"course": course, "year": course.start_date.year},
+            )
+        self.assertIn("Morning session", html)
+
+    def test_session_change_invalidates_course_list_item(self):
+        print("\ntest_session_change_invalidates_course_list_item")
+        self.render_course()
+        self.session.title = "Evening session"
+        self.session.save()
+        self.assertIn("Evening session", self.render_course())
+
+        self.session.delete()
+        self.assertNotIn("Evening session", self.render_course())
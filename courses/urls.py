@@ -5,4 +5,9 @@ from . import views
 
 urlpatterns = [
     path(_("courses/"), views.CourseList.as_view(), name="course_list"),
+    path(
+        _("courses/archive/<int:year>/"),
+        views.CourseArchive.as_view(),
+        name="course_archive",
+    ),
 ]
@@ -1,42 +1,53 @@
-from datetime import date
+from datetime import date, timedelta
 
 from django.shortcuts import render
 from django.views import View
 
 from course_registrations.models import CourseRegistration
 
-from .models import ExternalCourse, InternalCourse
+from .models import Course
 
 
 class CourseList(View):
     """Displays a list of all internal and external courses"""
 
     def get(self, request):
-        internal_courses = InternalCourse.objects.all()
-        external_courses = ExternalCourse.objects.all()
-
-        # Update the registration status for each course and set users registration status
-        for course in internal_courses:
-            course.save()
-
-            if request.user.is_authenticated:
-                course.user_registered = CourseRegistration.objects.filter(
-                    user=request.user, course=course
-                )
-
-        all_courses = list(internal_courses) + list(external_courses)
-        all_courses = sorted(
-            all_courses, key=lambda course: course.start_date, reverse=True)
-        past_courses = filter(
-            lambda course: course.end_date < date.today(), all_courses)
-        current_courses = filter(
-            lambda course: course.end_date >= date.today(), all_courses)
+        today = date.today()
+        courses = Course.objects.order_by("-start_date")
+
+        current_courses = courses.timeline(start=today).as_subclasses()
+        CourseRegistration.objects.set_user_registered(
+            current_courses, request.user)
+
+        # Past courses are loaded per year by the CourseArchive view
+        past_course_years = courses.timeline(
+            end=today - timedelta(days=1)
+        ).dates("start_date", "year", order="DESC")
 
         return render(
             request,
             "course_list.html",
             {
-                "past_courses": past_courses,
+                "past_course_years": past_course_years,
                 "current_courses": current_courses,
             },
         )
+
+
+class CourseArchive(View):
+    """Displays the past courses of a single year"""
+
+    def get(self, request, year):
+        courses = Course.objects.timeline(
+            end=date.today() - timedelta(days=1)
+        ).filter(start_date__year=year).order_by("-start_date").as_subclasses()
+        CourseRegistration.objects.set_user_registered(courses, request.user)
+
+        return render(
+            request,
+            "course_list_year.html",
+            {
+                "courses": courses,
+                "year": year,
+            },
+        )
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.utils import translation
+
+
+def make_key(name, language=None):
+    """Builds a cache key for name in the given or active language"""
+    language = language or translation.get_language() or settings.LANGUAGE_CODE
+    return f"{name}:{language}"
+
+
+def get_or_set(name, default, timeout=DEFAULT_TIMEOUT):
+    """Returns the cached value for name in the active language. If there
+    is none, default is called and its result is cached."""
+    return cache.get_or_set(make_key(name), default, timeout)
+
+
+def delete(*names):
+    """Deletes the cached values for the given names in all languages"""
+    cache.delete_many([
+        make_key(name, language)
+        for name in names
+        for language, _ in settings.LANGUAGES
+    ])
@@ -0,0 +1,191 @@
+import hashlib
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+from django.utils import timezone
+
+# Placeholder lists of IN clauses vary with the number of values
+PLACEHOLDER_LIST = re.compile(r"%s(\s*,\s*%s)+")
+
+# Profiles of the most recent requests, shared by all threads of the process
+REPORT = deque(maxlen=settings.PROFILING_REPORT_SIZE)
+
+_local = threading.local()
+
+
+def fingerprint(sql):
+    """Returns a short hash identifying the shape of a query regardless
+    of its parameters"""
+    shape = PLACEHOLDER_LIST.sub("%s, ...", sql)
+    return hashlib.md5(shape.encode()).hexdigest()[:8]
+
+
+def view_name(request):
+    """Returns the name of the view that handled the request"""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+    if match.view_name:
+        return match.view_name
+    # Class-based views are named after their class, not after as_view()
+    view = getattr(match.func, "view_class", match.func)
+    return f"{view.__module__}.{view.__qualname__}"
+
+
+class RequestProfile:
+    """Collects the queries and template render time of one request"""
+
+    def __init__(self):
+        self.sql_time = 0
+        self.template_time = 0
+        self.queries = Counter()
+        self.statements = {}
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            key = fingerprint(sql)
+            self.queries[key] += 1
+            self.statements.setdefault(key, sql)
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def duplicates(self):
+        """Returns (fingerprint, count, sql) of the query shapes that ran
+        more than once, most frequent first"""
+        return [
+            (key, count, self.statements[key])
+            for key, count in self.queries.most_common()
+            if count > 1
+        ]
+
+
+def _profiled_render(render):
+    """Wraps Template.render to add the time of outermost renders to the
+    profile of the current request. Included templates are part of the
+    outermost render and are not counted again."""
+
+    def wrapper(self, context):
+        profile = getattr(_local, "profile", None)
+        if profile is None:
+            return render(self, context)
+        profile._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile._template_depth -= 1
+            if not profile._template_depth:
+                profile.template_time += time.perf_counter() - start
+
+    wrapper.original = render
+    return wrapper
+
+
+_render_lock = threading.Lock()
+_profiled_requests = 0
+
+
+@contextmanager
+def template_timing():
+    """Wraps Template.render while at least one request of the process is
+    profiled and restores the original once the last one has finished"""
+    global _profiled_requests
+    with _render_lock:
+        if not _profiled_requests:
+            Template.render = _profiled_render(Template.render)
+        _profiled_requests += 1
+    try:
+        yield
+    finally:
+        with _render_lock:
+            _profiled_requests -= 1
+            if not _profiled_requests:
+                Template.render = Template.render.original
+
+
+class ProfilingMiddleware:
+    """Records the wall time, SQL queries and template render time of each
+    request. The timings are sent as Server-Timing header and kept in the
+    REPORT of recent requests, which staff can view at admin/profiling/.
+    Enabled with the PROFILING setting."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        _local.profile = profile
+        start = time.perf_counter()
+        try:
+            with template_timing(), \
+                    connections["default"].execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        total_time = time.perf_counter() - start
+
+        response["Server-Timing"] = ", ".join([
+            f"total;dur={total_time * 1000:.1f}",
+            f'sql;dur={profile.sql_time * 1000:.1f};'
+            f'desc="{profile.query_count} queries"',
+            f"template;dur={profile.template_time * 1000:.1f}",
+        ])
+        if getattr(request, "resolver_match", None) and \
+                request.resolver_match.url_name != "profiling_report":
+            REPORT.append({
+                "time": timezone.now(),
+                "method": request.method,
+                "path": request.path,
+                "view": view_name(request),
+                "status": response.status_code,
+                "total_time": total_time,
+                "sql_time": profile.sql_time,
+                "template_time": profile.template_time,
+                "query_count": profile.query_count,
+                "duplicates": profile.duplicates(),
+            })
+        return response
+
+
+def summary(entries):
+    """Aggregates profiled requests per view, slowest total time first"""
+    views = {}
+    for entry in entries:
+        views.setdefault(entry["view"], []).append(entry)
+
+    rows = []
+    for view, requests in views.items():
+        count = len(requests)
+        rows.append({
+            "view": view,
+            "requests": count,
+            "total_time": sum(r["total_time"] for r in requests),
+            "avg_time": sum(r["total_time"] for r in requests) / count,
+            "max_time": max(r["total_time"] for r in requests),
+            "avg_sql_time": sum(r["sql_time"] for r in requests) / count,
+            "avg_template_time":
+                sum(r["template_time"] for r in requests) / count,
+            "avg_queries": sum(r["query_count"] for r in requests) / count,
+            "max_duplicates": max(
+                (duplicate[1]
+                 for r in requests for duplicate in r["duplicates"]),
+                default=0,
+            ),
+        })
+    return sorted(rows, key=lambda row: row["total_time"], reverse=True)
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import time
+import traceback
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .profiling import fingerprint, view_name
+
+logger = logging.getLogger(__name__)
+
+
+def stack_origin():
+    """Returns "file:line in function" of the innermost project frame that
+    led to the current query, skipping Django and installed packages"""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if (filename.startswith(base_dir)
+                and "site-packages" not in filename
+                and filename != __file__):
+            return (f"{os.path.relpath(filename, base_dir)}:{frame.lineno} "
+                    f"in {frame.name}")
+    return None
+
+
+class QueryInspector:
+    """Execute wrapper logging slow queries of a request as they run and
+    repeated query shapes once the request is finished"""
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = Counter()
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            key = fingerprint(sql)
+            self.queries[key] += 1
+            if key not in self.statements:
+                self.statements[key] = (sql, stack_origin())
+            if duration * 1000 >= settings.QUERY_LOG_SLOW_MS:
+                self.log("slow_query", sql, stack_origin(),
+                         duration_ms=round(duration * 1000, 1))
+
+    def log(self, event, sql, origin, **extra):
+        logger.warning(
+            "%s in %s: %s", event, view_name(self.request), sql,
+            extra={
+                "event": event,
+                "view": view_name(self.request),
+                "path": self.request.path,
+                "sql": sql,
+                "origin": origin,
+                **extra,
+            },
+        )
+
+    def log_repeated(self):
+        """Logs the query shapes that ran at least QUERY_LOG_REPEATS times,
+        which usually means a query per object of a list (N+1)"""
+        for key, count in self.queries.most_common():
+            if count < settings.QUERY_LOG_REPEATS:
+                break
+            sql, origin = self.statements[key]
+            self.log("repeated_query", sql, origin,
+                     count=count, fingerprint=key)
+
+
+class QueryLogMiddleware:
+    """Logs slow and repeated queries with the view and the line of project
+    code they come from to the "danbw_website.querylog" logger.
+    Enabled with the QUERY_LOG setting."""
+
+    def __init__(self, get_response):
+        if not settings.QUERY_LOG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inspector = QueryInspector(request)
+        with connections["default"].execute_wrapper(inspector):
+            response = self.get_response(request)
+        inspector.log_repeated()
+        return response
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as one JSON object per line, including the
+    extra fields of the query log"""
+
+    FIELDS = ("event", "view", "path", "sql", "origin", "duration_ms",
+              "count", "fingerprint")
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            if hasattr(record, field):
+                data[field] = getattr(record, field)
+        return json.dumps(data, default=str)
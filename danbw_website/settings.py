@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import sys
+import tempfile
 from pathlib import Path
 
 import dj_database_url
@@ -20,6 +22,7 @@ if os.path.isfile("env.py"):
     import env
 
 development = os.environ.get("DEVELOPMENT", "False").lower() == "true"
+TESTING = sys.argv[1:2] == ["test"]
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -61,6 +64,7 @@ INSTALLED_APPS = [
     "course_registrations",
     "pages",
     "memberships",
+    "emails",
 ]
 
 SITE_ID = 1
@@ -92,8 +96,29 @@ EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL")
 
+# Store outgoing mails in the outbox instead of sending them during the
+# request. Requires the worker of the Procfile, which runs
+# "python manage.py send_queued_emails --loop". Mails are sent directly in
+# development and tests.
+EMAIL_QUEUE = os.environ.get(
+    "EMAIL_QUEUE", str(not (development or TESTING))).lower() == "true"
+
+# Number of mails sent over one SMTP connection before reconnecting
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", 50))
+
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Record timings and queries of every request, see danbw_website/profiling.py.
+# The report of the most recent requests is shown to staff at /admin/profiling/
+PROFILING = os.environ.get("PROFILING", "False").lower() == "true"
+PROFILING_REPORT_SIZE = int(os.environ.get("PROFILING_REPORT_SIZE", 500))
+
+# Log slow queries and query shapes repeated within one request (N+1) to
+# QUERY_LOG_FILE, see danbw_website/querylog.py
+QUERY_LOG = os.environ.get("QUERY_LOG", "False").lower() == "true"
+QUERY_LOG_SLOW_MS = int(os.environ.get("QUERY_LOG_SLOW_MS", 100))
+QUERY_LOG_REPEATS = int(os.environ.get("QUERY_LOG_REPEATS", 5))
+
 MESSAGE_TAGS = {
     messages.DEBUG: "alert-info",
     messages.INFO: "alert-info",
@@ -109,6 +134,8 @@ SUMMERNOTE_CONFIG = {
 }
 
 MIDDLEWARE = [
+    "danbw_website.profiling.ProfilingMiddleware",
+    "danbw_website.querylog.QueryLogMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
@@ -164,6 +191,47 @@ else:
         "default": dj_database_url.parse(os.environ.get("DATABASE_URL", ""))
     }
 
+# Caching
+# The backend is selected with the CACHE_BACKEND environment variable and
+# defaults to the database cache outside of development.
+# Cache keys are prefixed with the release version, so that a new deploy
+# does not read values cached by the previous one.
+CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "danbw",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get(
+            "CACHE_LOCATION", os.path.join(BASE_DIR, ".cache")),
+    },
+    "database": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+    },
+    "dummy": {
+        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+    },
+}
+
+CACHE_RELEASE = os.environ.get(
+    "CACHE_RELEASE", os.environ.get("HEROKU_RELEASE_VERSION", "dev"))
+
+# Production runs several worker processes, which need a shared cache so
+# that invalidations reach all of them. The table is created by the
+# "createcachetable" release step.
+CACHE_BACKEND = os.environ.get(
+    "CACHE_BACKEND", "locmem" if development else "database")
+
+CACHES = {
+    "default": {
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        "TIMEOUT": int(os.environ.get("CACHE_TIMEOUT", 3600)),
+        "KEY_PREFIX": f"danbw:{CACHE_RELEASE}",
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -182,7 +250,12 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-LOG_FILE = os.path.join(BASE_DIR, "django.log")
+# Test runs log to a temporary directory instead of the project directory
+LOG_DIR = os.environ.get(
+    "LOG_DIR", tempfile.gettempdir() if TESTING else BASE_DIR)
+LOG_FILE = os.path.join(LOG_DIR, "django.log")
+QUERY_LOG_FILE = os.environ.get(
+    "QUERY_LOG_FILE", os.path.join(LOG_DIR, "queries.log"))
 
 LOGGING = {
     "version": 1,
@@ -196,6 +269,9 @@ LOGGING = {
             "format": "{levelname} {message}",
             "style": "{",
         },
+        "json": {
+            "()": "danbw_website.querylog.JsonFormatter",
+        },
     },
     "handlers": {
         "file": {
@@ -204,6 +280,13 @@ LOGGING = {
             "filename": LOG_FILE,
             "formatter": "verbose",
         },
+        "queries": {
+            "level": "WARNING",
+            "class": "logging.FileHandler",
+            "filename": QUERY_LOG_FILE,
+            "formatter": "json",
+            "delay": True,
+        },
     },
     "loggers": {
         "django": {
@@ -211,6 +294,11 @@ LOGGING = {
             "level": "ERROR",
             "propagate": False,
         },
+        "danbw_website.querylog": {
+            "handlers": ["queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
     },
 }
 
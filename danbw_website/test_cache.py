@@ -0,0 +1,38 @@
+from django.core.cache import cache as django_cache
+from django.test import TestCase
+from django.utils import translation
+
+from . import cache
+
+
+class CacheHelperTest(TestCase):
+    """Tests for the cache helpers"""
+
+    def setUp(self):
+        django_cache.clear()
+
+    def test_make_key_uses_active_language(self):
+        print("\ntest_make_key_uses_active_language")
+        with translation.override("en"):
+            self.assertEqual(cache.make_key("navigation"), "navigation:en")
+        self.assertEqual(
+            cache.make_key("navigation", language="de"), "navigation:de")
+
+    def test_get_or_set(self):
+        print("\ntest_get_or_set")
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "value"
+
+        self.assertEqual(cache.get_or_set("test", compute), "value")
+        self.assertEqual(cache.get_or_set("test", compute), "value")
+        self.assertEqual(len(calls), 1)
+
+    def test_delete(self):
+        print("\ntest_delete")
+        with translation.override("de"):
+            cache.get_or_set("test", lambda: "value")
+        cache.delete("test")
+        self.assertIsNone(django_cache.get(cache.make_key("test", "de")))
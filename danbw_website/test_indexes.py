@@ -0,0 +1,66 @@
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase
+
+from course_registrations.models import CourseRegistration
+from courses.models import Course, InternalCourse
+from users.models import User
+
+
+class IndexUsageTest(TestCase):
+    """Checks with EXPLAIN that the hot lookups use an index"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="test-user")
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today(),
+            end_date=date.today(),
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == "postgresql":
+            # Small test tables would otherwise be scanned sequentially
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_course_timeline_uses_end_date_index(self):
+        print("\ntest_course_timeline_uses_end_date_index")
+        self.assertUsesIndex(
+            Course.objects.timeline(start=date.today()).order_by(),
+            "course_end_date_idx",
+        )
+
+    def test_course_year_uses_start_date_index(self):
+        print("\ntest_course_year_uses_start_date_index")
+        self.assertUsesIndex(
+            Course.objects.filter(start_date__year=date.today().year),
+            "course_start_date_idx",
+        )
+
+    def test_user_registration_uses_unique_index(self):
+        print("\ntest_user_registration_uses_unique_index")
+        self.assertUsesIndex(
+            CourseRegistration.objects.filter(
+                user=self.user, course=self.course),
+            "unique_user_registration",
+        )
+
+    def test_guest_registration_uses_unique_index(self):
+        print("\ntest_guest_registration_uses_unique_index")
+        self.assertUsesIndex(
+            CourseRegistration.objects.filter(
+                email="guest@example.com", course=self.course),
+            "unique_guest_registration",
+        )
+
+    def test_pending_exam_registration_uses_partial_index(self):
+        print("\ntest_pending_exam_registration_uses_partial_index")
+        self.assertUsesIndex(
+            CourseRegistration.objects.filter(
+                user=self.user, grade_updated=False, exam=True),
+            "registration_grade_pending_idx",
+        )
@@ -0,0 +1,106 @@
+from django.template.base import Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import ResolverMatch, reverse
+from django.views.generic import RedirectView
+
+from users.models import User
+
+from . import profiling
+
+
+@override_settings(PROFILING=True)
+class ProfilingMiddlewareTest(TestCase):
+    """Tests for the ProfilingMiddleware and the profiling report"""
+
+    def setUp(self):
+        profiling.REPORT.clear()
+        self.staff = User.objects.create_user(
+            username="staff", email="staff@example.com", is_staff=True)
+
+    def test_fingerprint_ignores_number_of_values(self):
+        print("\ntest_fingerprint_ignores_number_of_values")
+        self.assertEqual(
+            profiling.fingerprint("SELECT * FROM t WHERE id IN (%s, %s)"),
+            profiling.fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s)"),
+        )
+        self.assertNotEqual(
+            profiling.fingerprint("SELECT * FROM t WHERE id = %s"),
+            profiling.fingerprint("SELECT * FROM u WHERE id = %s"),
+        )
+
+    def test_server_timing_header(self):
+        print("\ntest_server_timing_header")
+        response = self.client.get(reverse("course_list"))
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^total;dur=[\d.]+, sql;dur=[\d.]+;desc="\d+ queries", '
+            r"template;dur=[\d.]+$",
+        )
+
+    def test_request_is_recorded(self):
+        print("\ntest_request_is_recorded")
+        self.client.get(reverse("course_list"))
+        entry = profiling.REPORT[-1]
+        self.assertEqual(entry["view"], "course_list")
+        self.assertEqual(entry["status"], 200)
+        self.assertGreater(entry["query_count"], 0)
+        self.assertGreater(entry["template_time"], 0)
+        self.assertLessEqual(entry["template_time"], entry["total_time"])
+
+    def test_view_name_of_unnamed_views(self):
+        print("\ntest_view_name_of_unnamed_views")
+        request = RequestFactory().get("/")
+        request.resolver_match = ResolverMatch(
+            profiling.summary, (), {}, url_name=None)
+        self.assertEqual(
+            profiling.view_name(request), "danbw_website.profiling.summary")
+
+        request.resolver_match = ResolverMatch(
+            RedirectView.as_view(), (), {}, url_name=None)
+        self.assertEqual(
+            profiling.view_name(request),
+            "django.views.generic.base.RedirectView")
+
+    def test_template_render_is_restored(self):
+        print("\ntest_template_render_is_restored")
+        render = Template.render
+        self.client.get(reverse("course_list"))
+        self.assertIs(Template.render, render)
+
+    def test_duplicate_queries(self):
+        print("\ntest_duplicate_queries")
+        profile = profiling.RequestProfile()
+        for pk in range(3):
+            profile(lambda *args: None, "SELECT %s", [pk], False, {})
+        profile(lambda *args: None, "SELECT 1", [], False, {})
+        self.assertEqual(profile.query_count, 4)
+        self.assertEqual(
+            profile.duplicates(),
+            [(profiling.fingerprint("SELECT %s"), 3, "SELECT %s")],
+        )
+
+    def test_report_requires_staff(self):
+        print("\ntest_report_requires_staff")
+        user = User.objects.create_user(
+            username="user", email="user@example.com")
+        self.client.force_login(user)
+        response = self.client.get(reverse("profiling_report"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_report(self):
+        print("\ntest_report")
+        self.client.get(reverse("course_list"))
+        self.client.get(reverse("course_list"))
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("profiling_report"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["views"]), 1)
+        self.assertEqual(response.context["views"][0]["requests"], 2)
+        self.assertContains(response, "course_list")
+
+    @override_settings(PROFILING=False)
+    def test_disabled(self):
+        print("\ntest_disabled")
+        response = self.client.get(reverse("course_list"))
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(len(profiling.REPORT), 0)
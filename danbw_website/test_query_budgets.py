@@ -0,0 +1,255 @@
+import tempfile
+import time as timer
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from course_registrations.models import (CourseRegistration,
+                                          CourseRegistrationSummary)
+from courses.models import CourseSession, ExternalCourse, InternalCourse
+from pages.models import Category, Page
+from users.models import User, UserProfile
+
+# Seeded data volumes
+COURSES = 200
+SESSIONS_PER_COURSE = 3
+USERS = 100
+REGISTRATIONS_PER_COURSE = 15
+
+# Wall-clock timings of the last run, reported after the test class
+TIMINGS = {}
+
+
+def seed_data():
+    """Creates courses spread over several years with sessions, users
+    with profiles and registrations, using bulk inserts"""
+    today = date.today()
+    courses = []
+    for i in range(COURSES):
+        start_date = today + timedelta(days=7 * (i - COURSES * 3 // 4))
+        courses.append(InternalCourse.objects.create(
+            title=f"Course {i}",
+            start_date=start_date,
+            end_date=start_date + timedelta(days=1),
+            publication_date=start_date - timedelta(days=60),
+            registration_start_date=start_date - timedelta(days=30),
+            registration_end_date=start_date - timedelta(days=1),
+            course_fee=100,
+            course_fee_cash=110,
+        ))
+        if i % 4 == 0:
+            ExternalCourse.objects.create(
+                title=f"External course {i}",
+                start_date=start_date,
+                end_date=start_date,
+            )
+
+    sessions = CourseSession.objects.bulk_create([
+        CourseSession(
+            title=f"Session {j}",
+            course=course,
+            date=course.start_date,
+            start_time=time(10 + j),
+            end_time=time(11 + j),
+            session_fee=30,
+        )
+        for course in courses
+        for j in range(SESSIONS_PER_COURSE)
+    ])
+
+    users = User.objects.bulk_create([
+        User(username=f"user{i}", email=f"user{i}@example.com",
+             first_name="User", last_name=str(i))
+        for i in range(USERS)
+    ])
+    UserProfile.objects.bulk_create([
+        UserProfile(user=user, slug=user.username, dojo="Dojo", grade=1)
+        for user in users
+    ])
+
+    registrations = CourseRegistration.objects.bulk_create([
+        CourseRegistration(
+            course=course,
+            user=users[(i * 7 + j) % USERS],
+            accept_terms=True,
+            final_fee=100,
+            payment_status=j % 2,
+            exam=j % 5 == 0,
+        )
+        for i, course in enumerate(courses)
+        for j in range(REGISTRATIONS_PER_COURSE)
+    ])
+    Through = CourseRegistration.selected_sessions.through
+    sessions_by_course = {}
+    for session in sessions:
+        sessions_by_course.setdefault(session.course_id, []).append(session)
+    Through.objects.bulk_create([
+        Through(courseregistration=registration, coursesession=session)
+        for registration in registrations
+        for session in sessions_by_course[registration.course_id]
+    ])
+    CourseRegistrationSummary.objects.rebuild()
+
+    category = Category.objects.create(title="Association", slug="association")
+    for i in range(20):
+        Page.objects.create(
+            title=f"Page {i}",
+            slug=f"page-{i}",
+            category=category,
+            status=1,
+            content="Content",
+        )
+    return courses, users
+
+
+# Query counts assume a cache that does not use the database
+@override_settings(CACHES={"default": settings.CACHE_BACKENDS["locmem"]})
+class QueryBudgetTestCase(TestCase):
+    """Base class for checking the number of queries of a view against a
+    budget on realistic data volumes. The wall-clock time of each checked
+    request is recorded and reported once the test class has run."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses, cls.users = seed_data()
+        cls.staff = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="admin")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        print(f"\n{cls.__name__} timings:")
+        for name, (queries, duration) in sorted(TIMINGS.items()):
+            print(f"  {name}: {queries} queries, {duration * 1000:.1f} ms")
+        TIMINGS.clear()
+
+    def setUp(self):
+        cache.clear()
+
+    @contextmanager
+    def assertQueryBudget(self, name, budget):
+        """Fails if the block runs more than budget queries"""
+        with CaptureQueriesContext(connection) as context:
+            start = timer.perf_counter()
+            yield
+            duration = timer.perf_counter() - start
+        queries = len(context.captured_queries)
+        TIMINGS[name] = (queries, duration)
+        self.assertLessEqual(
+            queries, budget,
+            f"{name} ran {queries} queries, the budget is {budget}:\n" +
+            "\n".join(query["sql"] for query in context.captured_queries),
+        )
+
+    def get(self, name, budget, url):
+        with self.assertQueryBudget(name, budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+
+class PublicViewQueryBudgetTest(QueryBudgetTestCase):
+    """Query budgets of the public views"""
+
+    def test_home_page(self):
+        print("\ntest_home_page")
+        self.get("HomePage", 8, reverse("home"))
+
+    def test_home_page_user(self):
+        print("\ntest_home_page_user")
+        self.client.force_login(self.users[0])
+        self.get("HomePage (user)", 11, reverse("home"))
+
+    def test_course_list(self):
+        print("\ntest_course_list")
+        self.get("CourseList", 8, reverse("course_list"))
+
+    def test_course_list_user(self):
+        print("\ntest_course_list_user")
+        self.client.force_login(self.users[0])
+        self.get("CourseList (user)", 11, reverse("course_list"))
+
+    def test_course_archive(self):
+        print("\ntest_course_archive")
+        year = self.courses[0].start_date.year
+        self.get("CourseArchive", 8, reverse("course_archive", args=[year]))
+
+    def test_register_course(self):
+        print("\ntest_register_course")
+        course = InternalCourse.objects.create(
+            title="Open course",
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=30),
+            registration_start_date=date.today(),
+            registration_end_date=date.today() + timedelta(days=20),
+        )
+        self.client.force_login(self.users[0])
+        self.get("RegisterCourse", 12,
+                 reverse("register_course", args=[course.slug]))
+
+    def test_course_registration_list(self):
+        print("\ntest_course_registration_list")
+        self.client.force_login(self.users[0])
+        self.get("CourseRegistrationList", 8,
+                 reverse("courseregistration_list"))
+
+    @override_settings(MEDIA_ROOT=tempfile.gettempdir())
+    def test_page_detail(self):
+        print("\ntest_page_detail")
+        self.get("PageDetail", 8, reverse("page_detail", args=["page-0"]))
+
+
+class AdminQueryBudgetTest(QueryBudgetTestCase):
+    """Query budgets of the admin changelists and course pages"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff)
+
+    def test_internal_course_changelist(self):
+        print("\ntest_internal_course_changelist")
+        self.get("InternalCourse changelist", 10,
+                 reverse("admin:courses_internalcourse_changelist"))
+
+    def test_internal_course_change(self):
+        print("\ntest_internal_course_change")
+        self.get("InternalCourse change", 11, reverse(
+            "admin:courses_internalcourse_change", args=[self.courses[0].pk]))
+
+    def test_internal_course_registrations(self):
+        print("\ntest_internal_course_registrations")
+        self.get("InternalCourse registrations", 10, reverse(
+            "admin:courses_internalcourse_registrations",
+            args=[self.courses[0].pk]))
+
+    def test_course_registration_changelist(self):
+        print("\ntest_course_registration_changelist")
+        self.get("CourseRegistration changelist", 12, reverse(
+            "admin:course_registrations_courseregistration_changelist"))
+
+    def test_course_registration_export(self):
+        print("\ntest_course_registration_export")
+        url = reverse("admin:courses_internalcourse_changelist")
+        data = {
+            "action": "export_csv",
+            "_selected_action": [course.pk for course in self.courses[:10]],
+        }
+        with self.assertQueryBudget("InternalCourse export", 40):
+            response = self.client.post(url, data)
+            b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+
+    def test_registration_summary_changelist(self):
+        print("\ntest_registration_summary_changelist")
+        self.get("CourseRegistrationSummary changelist", 8, reverse(
+            "admin:course_registrations_courseregistrationsummary_changelist"))
+
+    def test_page_changelist(self):
+        print("\ntest_page_changelist")
+        self.get("Page changelist", 10, reverse("admin:pages_page_changelist"))
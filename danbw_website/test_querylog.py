@@ -0,0 +1,87 @@
+import json
+import logging
+
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from courses.models import InternalCourse
+
+from . import querylog
+
+
+@override_settings(QUERY_LOG=True, QUERY_LOG_SLOW_MS=1000,
+                   QUERY_LOG_REPEATS=3)
+class QueryLogTest(TestCase):
+    """Tests for the slow and repeated query log"""
+
+    def test_repeated_queries_are_logged(self):
+        print("\ntest_repeated_queries_are_logged")
+        request = RequestFactory().get("/courses/")
+        inspector = querylog.QueryInspector(request)
+        for i in range(3):
+            inspector(lambda *args: None,
+                      "SELECT * FROM courses WHERE id = %s", [i], False, {})
+        with self.assertLogs("danbw_website.querylog", "WARNING") as logs:
+            inspector.log_repeated()
+        self.assertEqual(len(logs.records), 1)
+        record = logs.records[0]
+        self.assertEqual(record.event, "repeated_query")
+        self.assertEqual(record.count, 3)
+        self.assertEqual(record.path, "/courses/")
+        self.assertIn("danbw_website/test_querylog.py", record.origin)
+
+    def test_few_repeats_are_not_logged(self):
+        print("\ntest_few_repeats_are_not_logged")
+        inspector = querylog.QueryInspector(RequestFactory().get("/"))
+        for i in range(2):
+            inspector(lambda *args: None, "SELECT %s", [i], False, {})
+        with self.assertNoLogs("danbw_website.querylog", "WARNING"):
+            inspector.log_repeated()
+
+    @override_settings(QUERY_LOG_SLOW_MS=0)
+    def test_slow_query_is_logged(self):
+        print("\ntest_slow_query_is_logged")
+        with self.assertLogs("danbw_website.querylog", "WARNING") as logs:
+            self.client.get(reverse("course_list"))
+        events = {record.event for record in logs.records}
+        self.assertEqual(events, {"slow_query"})
+        views = {record.view for record in logs.records}
+        self.assertIn("course_list", views)
+
+    def test_n_plus_one_in_view_is_logged(self):
+        print("\ntest_n_plus_one_in_view_is_logged")
+        for i in range(3):
+            course = InternalCourse.objects.create(title=f"Course {i}")
+            course.sessions.create(title="Session")
+
+        def view(request):
+            for course in InternalCourse.objects.all():
+                list(course.sessions.all())
+
+        middleware = querylog.QueryLogMiddleware(view)
+        with self.assertLogs("danbw_website.querylog", "WARNING") as logs:
+            middleware(RequestFactory().get("/"))
+        record = logs.records[0]
+        self.assertEqual(record.event, "repeated_query")
+        self.assertEqual(record.count, 3)
+        self.assertIn("coursesession", record.sql)
+        self.assertIn("in view", record.origin)
+
+    def test_json_formatter(self):
+        print("\ntest_json_formatter")
+        record = logging.LogRecord(
+            "danbw_website.querylog", logging.WARNING, __file__, 1,
+            "%s in %s", ("slow_query", "course_list"), None)
+        record.event = "slow_query"
+        record.duration_ms = 120.5
+        data = json.loads(querylog.JsonFormatter().format(record))
+        self.assertEqual(data["message"], "slow_query in course_list")
+        self.assertEqual(data["event"], "slow_query")
+        self.assertEqual(data["duration_ms"], 120.5)
+        self.assertNotIn("sql", data)
+
+    @override_settings(QUERY_LOG=False)
+    def test_disabled(self):
+        print("\ntest_disabled")
+        with self.assertNoLogs("danbw_website.querylog", "WARNING"):
+            self.client.get(reverse("course_list"))
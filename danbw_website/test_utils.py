@@ -0,0 +1,131 @@
+import csv
+import io
+import zipfile
+from datetime import date, time
+
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+
+from course_registrations.models import CourseRegistration
+from courses.models import CourseSession, InternalCourse
+from users.models import User, UserProfile
+
+from . import utils
+
+
+class TestCsvExport(TestCase):
+    """Tests for the CSV export helpers"""
+
+    def setUp(self):
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today(),
+            end_date=date.today(),
+            course_type="international",
+        )
+        for i in range(3):
+            CourseRegistration.objects.create(
+                course=self.course,
+                email=f"guest{i}@example.com",
+                first_name=f"Guest {i}",
+                last_name="Test",
+                accept_terms=True,
+                dinner=True,
+            )
+
+    def test_csv_response_streams_registrations(self):
+        print("\ntest_csv_response_streams_registrations")
+        response = utils.csv_response(
+            "registrations.csv",
+            utils.write_registrations_csv,
+            CourseRegistration.objects.filter(course=self.course),
+        )
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(
+            response["Content-Disposition"],
+            "attachment; filename=registrations.csv",
+        )
+
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0][-2:], ["Dinner", "Overnight Stay"])
+        self.assertEqual(rows[1][:4], [
+            "Test course", "Guest 0", "Test", "guest0@example.com"])
+
+    def test_write_registrations_csv_without_registrations(self):
+        print("\ntest_write_registrations_csv_without_registrations")
+        writer = csv.writer(utils.Echo())
+        rows = list(utils.write_registrations_csv(
+            writer, CourseRegistration.objects.none()))
+        self.assertEqual(len(rows), 1)
+        self.assertNotIn("Dinner", rows[0])
+
+    def test_write_registrations_csv_query_count(self):
+        print("\ntest_write_registrations_csv_query_count")
+        sessions = [
+            CourseSession.objects.create(
+                title=f"Session {i}",
+                course=self.course,
+                date=date.today(),
+                start_time=time(10 + i),
+                end_time=time(11 + i),
+            )
+            for i in range(2)
+        ]
+        for i in range(10):
+            user = User.objects.create_user(
+                username=f"user{i}", email=f"user{i}@example.com")
+            UserProfile.objects.create(user=user, dojo="Dojo")
+            registration = CourseRegistration.objects.create(
+                course=self.course, user=user, accept_terms=True)
+            registration.selected_sessions.set(sessions)
+
+        writer = csv.writer(utils.Echo())
+        registrations = CourseRegistration.objects.filter(course=self.course)
+        # First registration, registrations with related objects, sessions
+        with self.assertNumQueries(3):
+            rows = list(utils.write_registrations_csv(writer, registrations))
+        self.assertEqual(len(rows), 14)
+        self.assertIn("Session 1", rows[-1])
+        self.assertIn("Dojo", rows[-1])
+
+    def test_stream_zip(self):
+        print("\ntest_stream_zip")
+        writer = csv.writer(utils.Echo())
+        registrations = CourseRegistration.objects.filter(course=self.course)
+        files = [
+            ("first.csv", utils.write_registrations_csv(writer, registrations)),
+            ("second.csv", ["a,b\r\n", "1,2\r\n"]),
+        ]
+        chunks = list(utils.stream_zip(files))
+        self.assertGreater(len(chunks), 1)
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zip_file:
+            self.assertEqual(zip_file.namelist(), ["first.csv", "second.csv"])
+            rows = zip_file.read("first.csv").decode().splitlines()
+            self.assertEqual(len(rows), 4)
+            self.assertEqual(zip_file.read("second.csv"), b"a,b\r\n1,2\r\n")
+
+
+class TestToggleExpression(TestCase):
+    """Tests for toggle_expression"""
+
+    def test_toggle_integer_field(self):
+        print("\ntest_toggle_integer_field")
+        course = InternalCourse.objects.create(
+            title="Test course", start_date=date.today(), end_date=date.today())
+        for payment_status in [0, 1]:
+            CourseRegistration.objects.create(
+                course=course,
+                email=f"guest{payment_status}@example.com",
+                accept_terms=True,
+                payment_status=payment_status,
+            )
+        registrations = CourseRegistration.objects.order_by("email")
+        with self.assertNumQueries(1):
+            updated = registrations.update(payment_status=utils.toggle_expression(
+                CourseRegistration, "payment_status"))
+        self.assertEqual(updated, 2)
+        self.assertQuerySetEqual(
+            registrations.values_list("payment_status", flat=True), [1, 0])
@@ -17,7 +17,11 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from .views import ProfilingReport
+
 urlpatterns = [
+    path("admin/profiling/", ProfilingReport.as_view(),
+         name="profiling_report"),
     path("admin/", admin.site.urls),
     path("", include("users.urls")),
     path("", include("courses.urls")),
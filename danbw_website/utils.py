@@ -1,15 +1,44 @@
+import csv
 import os
+import zipfile
 from smtplib import SMTPException
 
 from django.conf import settings
 from django.contrib import messages
-from django.core.mail import EmailMessage, send_mail
+from django.contrib.admin.utils import model_ngettext
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import BooleanField, Case, Value, When
+from django.http import StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.utils import translation
 from django.utils.formats import date_format, time_format
 from django.utils.translation import gettext as _
+from django.utils.translation import ngettext
 
 from danbw_website import constants
+from emails.models import OutgoingEmail
+from emails.utils import send_messages
+
+# Number of rows fetched from the database at once when exporting CSV
+CSV_CHUNK_SIZE = 500
+
+
+def deliver(*messages, connection=None):
+    """Sends EmailMessages over a single connection or, if EMAIL_QUEUE is
+    enabled, stores them in the outbox to be sent by the
+    send_queued_emails worker. Returns the messages that failed."""
+    if settings.EMAIL_QUEUE:
+        for message in messages:
+            OutgoingEmail.objects.queue(message)
+        return []
+    return [message for message, _error in send_messages(messages, connection)]
+
+
+def deliver_or_raise(message, error_message, connection=None):
+    """Delivers a single EmailMessage and raises an SMTPException with the
+    given error message if it could not be sent"""
+    if deliver(message, connection=connection):
+        raise SMTPException(error_message)
 
 
 def send_email_confirmation(user, request):
@@ -24,14 +53,24 @@ def send_email_confirmation(user, request):
     sender = settings.EMAIL_HOST_USER
     recipient = user.email
     message = "".join(message_parts)
-    try:
-        send_mail(subject, message, sender, [recipient])
-    except SMTPException:
+    if deliver(EmailMessage(subject, message, sender, [recipient])):
         messages.error(request, _(
             "Failed to send email confirmation email. Please contact the course team."))
 
 
-def send_registration_confirmation(request, registration):
+def send_registration_emails(request, registration):
+    """Sends the registration confirmation and the notification for the
+    course team over one connection. The notification is only sent if
+    the confirmation could be sent."""
+    connection = get_connection()
+    try:
+        send_registration_confirmation(request, registration, connection)
+        send_registration_notification(request, registration, connection)
+    finally:
+        connection.close()
+
+
+def send_registration_confirmation(request, registration, connection=None):
     """Sends a registration confirmation email"""
 
     translation.activate(request.LANGUAGE_CODE)
@@ -62,23 +101,22 @@ def send_registration_confirmation(request, registration):
     recipient = registration.user.email if request.user.is_authenticated else registration.email
     bcc_recipient = os.environ.get('EMAIL_HOST_USER')
 
-    try:
-        email = EmailMessage(
-            subject=subject,
-            body=message,
-            from_email=sender,
-            to=[recipient],
-            bcc=[bcc_recipient],
-        )
-        email.content_subtype = 'html'
-        email.send()
-    except SMTPException as e:
-        raise SMTPException(
-            _("Invalid email address. Please try again with a valid email address.")
-        ) from e
-
-
-def send_registration_notification(request, registration):
+    email = EmailMessage(
+        subject=subject,
+        body=message,
+        from_email=sender,
+        to=[recipient],
+        bcc=[bcc_recipient],
+    )
+    email.content_subtype = 'html'
+    deliver_or_raise(
+        email,
+        _("Invalid email address. Please try again with a valid email address."),
+        connection,
+    )
+
+
+def send_registration_notification(request, registration, connection=None):
     """Sends a registration notification email"""
     subject = _("[Dynamic Aikido Nocquet BW] New registration for ") + \
         registration.course.title
@@ -99,14 +137,28 @@ def send_registration_notification(request, registration):
     sender = settings.EMAIL_HOST_USER
     recipient = os.environ.get("COURSE_TEAM_EMAIL")
     message = "".join(message_parts)
+    deliver_or_raise(
+        EmailMessage(subject, message, sender, [recipient]),
+        _("Failed to send registration notification email. Please contact the course team."),
+        connection,
+    )
+
+
+def send_membership_emails(first_name, last_name, email, dojo, membership_type):
+    """Sends the membership confirmation and the notification for the
+    treasurer over one connection. The notification is only sent if the
+    confirmation could be sent."""
+    connection = get_connection()
     try:
-        send_mail(subject, message, sender, [recipient])
-    except SMTPException as e:
-        raise SMTPException(
-            _("Failed to send registration notification email. Please contact the course team.")) from e
+        send_membership_confirmation(
+            first_name, email, membership_type, connection)
+        send_membership_notification(
+            first_name, last_name, email, dojo, membership_type, connection)
+    finally:
+        connection.close()
 
 
-def send_membership_confirmation(first_name, email, membership_type):
+def send_membership_confirmation(first_name, email, membership_type, connection=None):
     """Sends a membership confirmation email"""
     membership = get_tuple_value(constants.MEMBERSHIP_TYPES, membership_type)
     subject = _("[Dynamic Aikido Nocquet BW] Your {membership} application").format(
@@ -146,14 +198,15 @@ def send_membership_confirmation(first_name, email, membership_type):
     recipient = email
     message = "".join(message_parts)
 
-    try:
-        send_mail(subject, message, sender, [recipient])
-    except SMTPException as e:
-        raise SMTPException(
-            _("Invalid email address. Please try again with a valid email address.")) from e
+    deliver_or_raise(
+        EmailMessage(subject, message, sender, [recipient]),
+        _("Invalid email address. Please try again with a valid email address."),
+        connection,
+    )
 
 
-def send_membership_notification(first_name, last_name, email, dojo, membership_type):
+def send_membership_notification(first_name, last_name, email, dojo, membership_type,
+                                 connection=None):
     """Sends a membership notification email"""
     membership = get_tuple_value(constants.MEMBERSHIP_TYPES, membership_type)
     subject = _("[Dynamic Aikido Nocquet BW] New {membership} application").format(
@@ -172,15 +225,95 @@ def send_membership_notification(first_name, last_name, email, dojo, membership_
     sender = settings.EMAIL_HOST_USER
     recipient = os.environ.get("TREASURER_EMAIL")
     message = "".join(message_parts)
-    try:
-        send_mail(subject, message, sender, [recipient])
-    except SMTPException as e:
-        raise SMTPException(
-            _("Failed to send membership notification email. Please contact the course team.")) from e
+    deliver_or_raise(
+        EmailMessage(subject, message, sender, [recipient]),
+        _("Failed to send membership notification email. Please contact the course team."),
+        connection,
+    )
+
+
+def course_participants_messages(course, subject, message):
+    """Returns one EmailMessage per participant of a course, to be sent
+    with deliver() over a shared connection"""
+    recipients = course.courseregistration_set.exclude(email=None).exclude(
+        email="").order_by("email").values_list("email", flat=True).distinct()
+    sender = settings.DEFAULT_FROM_EMAIL
+    return [
+        EmailMessage(subject, message, sender, [recipient])
+        for recipient in recipients
+    ]
+
+
+class Echo:
+    """Pseudo buffer whose write() returns the written value instead of
+    storing it, so that a csv.writer returns each row as a string"""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, write_csv, queryset):
+    """Returns a StreamingHttpResponse for a CSV file, with the rows
+    generated by write_csv while the response is sent"""
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        write_csv(writer, queryset), content_type="text/csv")
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+class ZipBuffer:
+    """Write-only buffer collecting the bytes written by a ZipFile until
+    they are drained. As it is not seekable, ZipFile writes the archive
+    strictly sequentially."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(files):
+    """Yields a ZIP archive chunk by chunk without temporary files.
+    files is an iterable of (filename, rows) tuples, rows being an
+    iterable of strings such as the ones yielded by
+    write_registrations_csv."""
+    buffer = ZipBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for filename, rows in files:
+            with zip_file.open(filename, "w") as member:
+                for row in rows:
+                    member.write(row.encode())
+                    data = buffer.drain()
+                    if data:
+                        yield data
+    yield buffer.drain()
+
+
+def zip_response(filename, files):
+    """Returns a StreamingHttpResponse for a ZIP archive built by
+    stream_zip while the response is sent"""
+    response = StreamingHttpResponse(
+        stream_zip(files), content_type="application/zip")
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
 
 
 def write_registrations_csv(writer, registrations):
-    """Write registration data to CSV"""
+    """Write registration data to CSV, yielding the result of each
+    writerow() call. The registrations are fetched in chunks together
+    with their course, user, profile and sessions, so that exports run
+    in constant memory and a constant number of queries per chunk."""
 
     header_row = [
         _("Course"),
@@ -200,12 +333,16 @@ def write_registrations_csv(writer, registrations):
         _("Accept Terms"),
         _("Registration Date"),
     ]
-    if registrations and registrations[0].course.course_type == "international":
+    first_registration = registrations.select_related("course").first()
+    if first_registration and first_registration.course.course_type == "international":
         header_row.append("Dinner")
         header_row.append("Overnight Stay")
-    writer.writerow(header_row)
+    yield writer.writerow(header_row)
+
+    registrations = registrations.select_related(
+        "course", "user__profile").prefetch_related("selected_sessions")
 
-    for registration in registrations:
+    for registration in registrations.iterator(chunk_size=CSV_CHUNK_SIZE):
         selected_sessions = ", ".join(
             f"{session.date.strftime('%d.%m.%Y')}, {session.start_time.strftime('%H:%M')}"
             f"-{session.end_time.strftime('%H:%M')}: {session.title}"
@@ -239,11 +376,12 @@ def write_registrations_csv(writer, registrations):
             data_row.append(_("Yes") if registration.dinner else _("No"))
             data_row.append(
                 _("Yes") if registration.overnight_stay else _("No"))
-        writer.writerow(data_row)
+        yield writer.writerow(data_row)
 
 
 def write_membership_csv(writer, memberships):
-    """Write membership data to CSV"""
+    """Write membership data to CSV, yielding the result of each
+    writerow() call"""
 
     header_row = [
         _("First Name"),
@@ -260,9 +398,9 @@ def write_membership_csv(writer, memberships):
         _("Dojo"),
         _("Accept Terms"),
     ]
-    writer.writerow(header_row)
+    yield writer.writerow(header_row)
 
-    for membership in memberships:
+    for membership in memberships.iterator(chunk_size=CSV_CHUNK_SIZE):
         if hasattr(membership, "user"):
             user = membership.user
         else:
@@ -283,7 +421,28 @@ def write_membership_csv(writer, memberships):
             user.profile.dojo if user else membership.dojo,
             _("Yes") if membership.accept_terms else _("No"),
         ]
-        writer.writerow(data_row)
+        yield writer.writerow(data_row)
+
+
+def toggle_expression(model, field_name):
+    """Returns an expression flipping a 0/1 or boolean field, to toggle it
+    for a whole queryset in a single UPDATE"""
+    field = model._meta.get_field(field_name)
+    on, off = (True, False) if isinstance(field, BooleanField) else (1, 0)
+    return Case(
+        When(**{field_name: off}, then=Value(on)),
+        default=Value(off),
+        output_field=field,
+    )
+
+
+def report_updated(modeladmin, request, count):
+    """Shows the number of objects changed by an admin action"""
+    modeladmin.message_user(request, ngettext(
+        "%(count)d %(items)s was updated.",
+        "%(count)d %(items)s were updated.",
+        count,
+    ) % {"count": count, "items": model_ngettext(modeladmin.opts, count)})
 
 
 def get_tuple_value(tuple_of_tuples, key):
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.shortcuts import render
+from django.utils.translation import gettext as _
+from django.views import View
+
+from .profiling import REPORT, summary
+
+
+class ProfilingReport(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Displays the timings and queries of the most recent requests
+    recorded by the ProfilingMiddleware"""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        entries = list(REPORT)
+        return render(
+            request,
+            "admin/profiling_report.html",
+            {
+                "title": _("Profiling"),
+                "enabled": settings.PROFILING,
+                "recorded": len(entries),
+                "views": summary(entries),
+                "recent": entries[::-1][:50],
+                "report_size": REPORT.maxlen,
+            },
+        )
@@ -0,0 +1,46 @@
+from django.contrib import admin
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .models import OutgoingEmail
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        "subject",
+        "to",
+        "status",
+        "attempts",
+        "next_attempt",
+        "created",
+        "sent",
+    )
+    list_filter = ("status",)
+    search_fields = ["subject", "to"]
+    readonly_fields = (
+        "subject",
+        "body",
+        "content_subtype",
+        "from_email",
+        "to",
+        "bcc",
+        "reply_to",
+        "status",
+        "attempts",
+        "next_attempt",
+        "last_error",
+        "created",
+        "sent",
+    )
+    actions = ["retry"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        """Action for queueing failed emails again"""
+        queryset.exclude(status=1).update(
+            status=0, attempts=0, next_attempt=timezone.now())
+
+    retry.short_description = _("Retry selected emails")
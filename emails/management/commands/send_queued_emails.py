@@ -0,0 +1,50 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from emails.models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Sends queued emails from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox for new emails",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=10,
+            help="Number of seconds between two polls in loop mode",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Maximum number of emails sent per poll",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent = OutgoingEmail.objects.send_due(
+                    limit=options["batch_size"])
+            except Exception:
+                if not options["loop"]:
+                    raise
+                # Keep the worker running, e.g. if the database is gone
+                logger.exception("Failed to send queued emails")
+            else:
+                if sent:
+                    self.stdout.write(f"Sent {sent} emails.")
+            if not options["loop"]:
+                break
+            close_old_connections()
+            time.sleep(options["interval"])
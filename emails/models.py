@@ -0,0 +1,155 @@
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .utils import send_messages
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(minutes=1)
+# Time after which an email claimed by a worker is considered unsent
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+class OutgoingEmailQuerySet(models.QuerySet):
+    """Custom queryset for the email outbox"""
+
+    def queue(self, message):
+        """Stores an EmailMessage to be sent by the worker"""
+        return self.create(
+            subject=message.subject,
+            body=message.body,
+            content_subtype=message.content_subtype,
+            from_email=message.from_email,
+            to=message.to,
+            bcc=message.bcc,
+            reply_to=message.reply_to,
+        )
+
+    def due(self):
+        """Queued emails whose next attempt is due, and emails claimed by a
+        worker that did not record a result before the claim expired"""
+        return self.filter(
+            Q(status=0) | Q(status=3), next_attempt__lte=timezone.now())
+
+    def claim(self, limit=50):
+        """Marks due emails as being sent in a short transaction and
+        returns them. The claim expires after CLAIM_TIMEOUT, so emails of
+        a worker that stopped while sending are picked up again."""
+        with transaction.atomic():
+            emails = list(self.due().order_by("next_attempt").select_for_update(
+                skip_locked=True)[:limit])
+            self.filter(pk__in=[email.pk for email in emails]).update(
+                status=3, next_attempt=timezone.now() + CLAIM_TIMEOUT)
+        return emails
+
+    def send_due(self, limit=50):
+        """Sends due emails and returns the number of sent emails.
+        The emails are claimed before sending, so that several workers do
+        not send the same email twice, and are sent outside of a
+        transaction over one connection. The result of each email is
+        saved right after it has been sent."""
+        sent = 0
+        connection = get_connection()
+        try:
+            for email in self.claim(limit):
+                sent += email.send(connection)
+        finally:
+            connection.close()
+        return sent
+
+
+class OutgoingEmail(models.Model):
+    """Represents an email waiting to be sent by the send_queued_emails
+    worker"""
+
+    STATUS = (
+        (0, _("Queued")),
+        (1, _("Sent")),
+        (2, _("Failed")),
+        (3, _("Sending")),
+    )
+
+    subject = models.TextField(_("Subject"))
+    body = models.TextField(_("Body"))
+    content_subtype = models.CharField(
+        _("Content Type"),
+        max_length=20,
+        default="plain",
+    )
+    from_email = models.CharField(
+        _("From"),
+        max_length=254,
+        blank=True,
+        null=True,
+    )
+    to = models.JSONField(_("To"), default=list)
+    bcc = models.JSONField(_("Bcc"), default=list, blank=True)
+    reply_to = models.JSONField(_("Reply to"), default=list, blank=True)
+    status = models.IntegerField(
+        _("Status"),
+        choices=STATUS,
+        default=0,
+    )
+    attempts = models.IntegerField(_("Attempts"), default=0)
+    next_attempt = models.DateTimeField(
+        _("Next Attempt"),
+        default=timezone.now,
+    )
+    last_error = models.TextField(_("Last Error"), blank=True)
+    created = models.DateTimeField(_("Created"), auto_now_add=True)
+    sent = models.DateTimeField(_("Sent"), blank=True, null=True)
+
+    objects = OutgoingEmailQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["-created"]
+        verbose_name = _("Outgoing Email")
+        verbose_name_plural = _("Outgoing Emails")
+
+    def __str__(self):
+        return self.subject
+
+    def to_message(self):
+        message = EmailMessage(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.to,
+            bcc=self.bcc,
+            reply_to=self.reply_to,
+        )
+        message.content_subtype = self.content_subtype
+        return message
+
+    def send(self, connection=None):
+        """Sends the email and records the result.
+        Returns 1 if the email has been sent, otherwise 0."""
+        message = self.to_message()
+        failed = dict(send_messages([message], connection))
+        return self.record_attempt(failed.get(message))
+
+    def record_attempt(self, error=None):
+        """Records the result of a send attempt. Failed emails are
+        retried with exponential backoff until MAX_ATTEMPTS is reached.
+        Returns 1 if the email has been sent, otherwise 0."""
+        self.attempts += 1
+        if error is not None:
+            self.last_error = str(error)
+            if self.attempts >= MAX_ATTEMPTS:
+                self.status = 2
+            else:
+                self.status = 0
+                self.next_attempt = timezone.now() + \
+                    RETRY_DELAY * 2 ** (self.attempts - 1)
+            self.save()
+            return 0
+
+        self.status = 1
+        self.sent = timezone.now()
+        self.last_error = ""
+        self.save()
+        return 1
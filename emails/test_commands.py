@@ -0,0 +1,25 @@
+from io import StringIO
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.test import TestCase
+
+from .models import OutgoingEmail
+
+
+class SendQueuedEmailsCommandTest(TestCase):
+    """Tests for the send_queued_emails management command"""
+
+    def test_command_sends_queued_emails(self):
+        print("\ntest_command_sends_queued_emails")
+        for i in range(3):
+            OutgoingEmail.objects.queue(
+                EmailMessage(f"Subject {i}", "Body", to=["to@example.com"]))
+        out = StringIO()
+        call_command("send_queued_emails", batch_size=2, stdout=out)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("Sent 2 emails.", out.getvalue())
+
+        call_command("send_queued_emails", stdout=out)
+        self.assertEqual(len(mail.outbox), 3)
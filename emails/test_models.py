@@ -0,0 +1,100 @@
+from smtplib import SMTPException
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from danbw_website import utils
+
+from .models import MAX_ATTEMPTS, OutgoingEmail
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise SMTPException("Connection refused")
+
+
+class TestOutgoingEmail(TestCase):
+    """Tests for the OutgoingEmail model"""
+
+    def setUp(self):
+        message = EmailMessage(
+            subject="Test subject",
+            body="<p>Test body</p>",
+            from_email="from@example.com",
+            to=["to@example.com"],
+            bcc=["bcc@example.com"],
+        )
+        message.content_subtype = "html"
+        self.email = OutgoingEmail.objects.queue(message)
+
+    def test_send_due(self):
+        print("\ntest_send_due")
+        self.assertEqual(OutgoingEmail.objects.send_due(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "Test subject")
+        self.assertEqual(mail.outbox[0].bcc, ["bcc@example.com"])
+        self.assertEqual(mail.outbox[0].content_subtype, "html")
+
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, 1)
+        self.assertIsNotNone(self.email.sent)
+        self.assertEqual(OutgoingEmail.objects.send_due(), 0)
+
+    @override_settings(
+        EMAIL_BACKEND="emails.test_models.FailingEmailBackend")
+    def test_failed_email_is_retried_with_backoff(self):
+        print("\ntest_failed_email_is_retried_with_backoff")
+        self.assertEqual(OutgoingEmail.objects.send_due(), 0)
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, 0)
+        self.assertEqual(self.email.attempts, 1)
+        self.assertEqual(self.email.last_error, "Connection refused")
+        self.assertGreater(self.email.next_attempt, timezone.now())
+        self.assertFalse(OutgoingEmail.objects.due().exists())
+
+    @override_settings(
+        EMAIL_BACKEND="emails.test_models.FailingEmailBackend")
+    def test_email_fails_after_max_attempts(self):
+        print("\ntest_email_fails_after_max_attempts")
+        for _ in range(MAX_ATTEMPTS):
+            self.email.send()
+        self.assertEqual(self.email.status, 2)
+        self.assertEqual(self.email.attempts, MAX_ATTEMPTS)
+
+    @override_settings(EMAIL_QUEUE=True)
+    def test_deliver_queues_email(self):
+        print("\ntest_deliver_queues_email")
+        utils.deliver(EmailMessage("Queued", "Body", to=["to@example.com"]))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(OutgoingEmail.objects.filter(subject="Queued").exists())
+
+    def test_deliver_sends_email(self):
+        print("\ntest_deliver_sends_email")
+        utils.deliver(EmailMessage("Direct", "Body", to=["to@example.com"]))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutgoingEmail.objects.filter(subject="Direct").exists())
+
+    def test_claimed_email_is_not_due(self):
+        print("\ntest_claimed_email_is_not_due")
+        self.assertEqual(OutgoingEmail.objects.claim(), [self.email])
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, 3)
+        self.assertFalse(OutgoingEmail.objects.due().exists())
+
+        # The claim of a worker that stopped while sending expires
+        OutgoingEmail.objects.update(next_attempt=timezone.now())
+        self.assertEqual(OutgoingEmail.objects.send_due(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_invalid_email_does_not_stop_batch(self):
+        print("\ntest_invalid_email_does_not_stop_batch")
+        OutgoingEmail.objects.queue(EmailMessage(
+            "Bad\nheader", "Body", to=["to@example.com"]))
+        self.assertEqual(OutgoingEmail.objects.send_due(), 1)
+        bad = OutgoingEmail.objects.get(subject="Bad\nheader")
+        self.assertEqual(bad.status, 0)
+        self.assertEqual(bad.attempts, 1)
+        self.assertIn("newline", bad.last_error)
@@ -0,0 +1,68 @@
+from smtplib import SMTPRecipientsRefused
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+
+from .utils import send_messages
+
+
+class CountingEmailBackend(EmailBackend):
+    """Locmem backend counting opened connections and refusing
+    invalid@example.com"""
+
+    opened = 0
+    is_open = False
+
+    def open(self):
+        if self.is_open:
+            return False
+        self.is_open = True
+        CountingEmailBackend.opened += 1
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        for message in messages:
+            if "invalid@example.com" in message.to:
+                raise SMTPRecipientsRefused({"invalid@example.com": (550, b"")})
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="emails.test_utils.CountingEmailBackend")
+class TestSendMessages(TestCase):
+    """Tests for send_messages"""
+
+    def setUp(self):
+        CountingEmailBackend.opened = 0
+        self.messages = [
+            EmailMessage(f"Subject {i}", "Body", to=[f"to{i}@example.com"])
+            for i in range(5)
+        ]
+
+    def test_messages_share_one_connection(self):
+        print("\ntest_messages_share_one_connection")
+        self.assertEqual(send_messages(self.messages), [])
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(CountingEmailBackend.opened, 1)
+
+    def test_connection_is_renewed_per_batch(self):
+        print("\ntest_connection_is_renewed_per_batch")
+        send_messages(self.messages, batch_size=2)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(CountingEmailBackend.opened, 3)
+
+    def test_failure_does_not_abort_batch(self):
+        print("\ntest_failure_does_not_abort_batch")
+        invalid = EmailMessage("Invalid", "Body", to=["invalid@example.com"])
+        self.messages.insert(2, invalid)
+        failed = send_messages(self.messages)
+        self.assertEqual(len(failed), 1)
+        self.assertIs(failed[0][0], invalid)
+        self.assertIsInstance(failed[0][1], SMTPRecipientsRefused)
+        self.assertEqual(len(mail.outbox), 5)
+        # The connection is renewed after the failure
+        self.assertEqual(CountingEmailBackend.opened, 2)
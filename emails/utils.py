@@ -0,0 +1,38 @@
+import logging
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+def send_messages(messages, connection=None, batch_size=None):
+    """Sends EmailMessages reusing one connection instead of connecting
+    and logging in for every message. The connection is renewed after
+    batch_size messages and after a failure. A failing message does not
+    abort the remaining ones, whether the server rejects it or the message
+    itself is invalid, e.g. because of a malformed header.
+    Returns a list of (message, error) tuples for the failed messages."""
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    owns_connection = connection is None
+    if owns_connection:
+        connection = get_connection()
+
+    failed = []
+    try:
+        for index, message in enumerate(messages):
+            if index and index % batch_size == 0:
+                connection.close()
+            try:
+                connection.open()
+                connection.send_messages([message])
+            except Exception as e:
+                logger.warning("Failed to send email %r to %s: %s",
+                               message.subject, message.to, e)
+                failed.append((message, e))
+                # The server may have dropped the connection
+                connection.close()
+    finally:
+        if owns_connection:
+            connection.close()
+    return failed
@@ -1,8 +1,6 @@
-import csv
 from datetime import date
 
 from django.contrib import admin
-from django.http import HttpResponse
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
 
@@ -12,9 +10,9 @@ from .models import ChildrensPassport, DanBwMembership, DanIntMembership
 
 
 def toggle_passport_issued(modeladmin, request, queryset):
-    for obj in queryset:
-        obj.passport_issued = not obj.passport_issued
-        obj.save()
+    updated = queryset.update(passport_issued=utils.toggle_expression(
+        queryset.model, "passport_issued"))
+    utils.report_updated(modeladmin, request, updated)
 
 
 toggle_passport_issued.short_description = _("Toggle Passport Status")
@@ -24,15 +22,11 @@ def export_csv(self, request, queryset):
     """Action for exporting course memberships to CSV"""
 
     membership_type = queryset.first().__class__.__name__.lower()
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = (
-        f"attachment; filename={membership_type}s_{slugify(date.today())}.csv"
+    return utils.csv_response(
+        f"{membership_type}s_{slugify(date.today())}.csv",
+        utils.write_membership_csv,
+        queryset,
     )
-    writer = csv.writer(response)
-
-    utils.write_membership_csv(writer, queryset)
-
-    return response
 
 
 export_csv.short_description = _("Export selected entries to CSV")
@@ -35,9 +35,7 @@ class BaseMembershipCreateView(generic.CreateView):
         dojo = form.cleaned_data["dojo"]
 
         try:
-            utils.send_membership_confirmation(
-                first_name, email, self.membership_type)
-            utils.send_membership_notification(
+            utils.send_membership_emails(
                 first_name, last_name, email, dojo, self.membership_type)
         except SMTPException as e:
             form.add_error("email", e)
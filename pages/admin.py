@@ -4,6 +4,9 @@ from django_summernote.admin import SummernoteModelAdmin
 from django_summernote.widgets import SummernoteWidget
 from django.utils.translation import gettext_lazy as _
 
+from danbw_website import cache, utils
+
+from .context_processors import NAVIGATION_CACHE_KEY
 from .models import Category, Page
 
 
@@ -18,9 +21,11 @@ class PageAdmin(SummernoteModelAdmin):
 
     def toggle_status(self, request, queryset):
         """Action for toggling page status"""
-        for page in queryset:
-            page.status = not page.status
-            page.save()
+        updated = queryset.update(
+            status=utils.toggle_expression(Page, "status"))
+        # update() does not send post_save, which clears the navigation
+        cache.delete(NAVIGATION_CACHE_KEY)
+        utils.report_updated(self, request, updated)
 
     toggle_status.short_description = _("Toggle page status")
 
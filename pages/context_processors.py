@@ -1,7 +1,30 @@
+from django.db.models import Prefetch
 from django.urls import Resolver404, resolve
 from django.utils.translation import gettext as _
 
-from .models import Category
+from danbw_website import cache
+
+from .models import Category, Page
+
+NAVIGATION_CACHE_KEY = "navigation"
+
+
+def build_navigation():
+    """Loads all categories with their published pages in two queries"""
+    categories = list(Category.objects.prefetch_related(
+        Prefetch("pages", queryset=Page.objects.filter(status=1))
+    ))
+    footer_links = next(
+        (category for category in categories if category.slug == "footer-links"),
+        None,
+    )
+    return {
+        "categories": [
+            category for category in categories
+            if category.slug != "footer-links"
+        ],
+        "footer_links": footer_links,
+    }
 
 
 def add_categories_to_context(request):
@@ -10,15 +33,11 @@ def add_categories_to_context(request):
     Django documentation for context processors:
     https://docs.djangoproject.com/en/4.2/ref/templates/api/#writing-
     your-own-context-processors
+    The navigation is cached until a category or page is changed.
     """
-    categories = Category.objects.exclude(slug="footer-links")
-
-    try:
-        footer_links = Category.objects.get(slug="footer-links")
-    except Category.DoesNotExist:
-        footer_links = None
+    navigation = cache.get_or_set(NAVIGATION_CACHE_KEY, build_navigation)
 
-    return {"categories": categories, "footer_links": footer_links, "category_slug": None, "page_slug": None}
+    return {**navigation, "category_slug": None, "page_slug": None}
 
 
 def breadcrumb_context(request):
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from danbw_website import cache
+
+from .context_processors import NAVIGATION_CACHE_KEY
+from .models import Category, Page
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Page)
+def navigation_changed(sender, instance, **kwargs):
+    cache.delete(NAVIGATION_CACHE_KEY)
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from .context_processors import add_categories_to_context
+from .models import Category, Page
+
+
+# Query counts assume a cache that does not use the database
+@override_settings(CACHES={"default": settings.CACHE_BACKENDS["locmem"]})
+class AddCategoriesToContextTest(TestCase):
+    """Tests for the add_categories_to_context context processor"""
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get("/")
+        self.category = Category.objects.create(
+            title="Test Category", slug="test-category")
+        self.footer_links = Category.objects.create(
+            title="Footer Links", slug="footer-links")
+        self.page = Page.objects.create(
+            title="Test Page",
+            slug="test-page",
+            category=self.category,
+            status=1,
+        )
+        Page.objects.create(
+            title="Draft Page",
+            slug="draft-page",
+            category=self.category,
+            status=0,
+        )
+
+    def test_navigation_contains_published_pages(self):
+        print("\ntest_navigation_contains_published_pages")
+        context = add_categories_to_context(self.request)
+        self.assertEqual(context["categories"], [self.category])
+        self.assertEqual(context["footer_links"], self.footer_links)
+        self.assertEqual(
+            list(context["categories"][0].pages.all()), [self.page])
+
+    def test_navigation_is_cached(self):
+        print("\ntest_navigation_is_cached")
+        add_categories_to_context(self.request)
+        with self.assertNumQueries(0):
+            context = add_categories_to_context(self.request)
+            list(context["categories"][0].pages.all())
+
+    def test_page_change_invalidates_navigation(self):
+        print("\ntest_page_change_invalidates_navigation")
+        add_categories_to_context(self.request)
+        self.page.title = "Updated Page"
+        self.page.save()
+        context = add_categories_to_context(self.request)
+        self.assertEqual(
+            context["categories"][0].pages.all()[0].title, "Updated Page")
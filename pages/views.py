@@ -9,7 +9,7 @@ from django.utils.translation import gettext as _
 from django.views import View, generic
 
 from course_registrations.models import CourseRegistration
-from courses.models import ExternalCourse, InternalCourse
+from courses.models import Course
 
 from . import forms
 from .models import Category, Page
@@ -19,46 +19,19 @@ class HomePage(View):
     """Displays the home page"""
 
     def get(self, request):
-        all_courses = (
-            list(InternalCourse.objects.all()) +
-            list(ExternalCourse.objects.all())
-        )
+        upcoming_courses = Course.objects.timeline(
+            start=date.today(),
+            end=date.today() + timedelta(days=90),
+        ).as_subclasses()
 
-        upcoming_courses = []
-        upcoming_courses = [
-            course
-            for course in all_courses
-            if course.end_date >= date.today()
-            and course.end_date <= date.today() + timedelta(days=90)
-        ]
-
-        for course in upcoming_courses:
-            if (
-                request.user.is_authenticated and
-                course.get_course_type() == "InternalCourse"
-            ):
-                course.user_registered = CourseRegistration.objects.filter(
-                    user=request.user, course=course
-                ).exists()
-
-        upcoming_registrations = []
-        if request.user.is_authenticated:
-            all_registrations = CourseRegistration.objects.filter(
-                user=request.user
-            )
-            upcoming_registrations = [
-                registration
-                for registration in all_registrations
-                if registration.course.end_date >= date.today()
-                and registration.course.end_date <= date.today() + timedelta(days=90)
-            ]
+        CourseRegistration.objects.set_user_registered(
+            upcoming_courses, request.user)
 
         return render(
             request,
             "index.html",
             {
                 "upcoming_courses": upcoming_courses,
-                "upcoming_registrations": upcoming_registrations,
             },
         )
 
@@ -0,0 +1,40 @@
+document.addEventListener("DOMContentLoaded", function () {
+  /**
+   * Load a page of registrations into the registrations panel. If loading
+   * fails, an error is shown and the panel loads again when reopened.
+   */
+  function loadRegistrations(panel, url) {
+    const content = panel.querySelector(".registrations-panel-content");
+    fetch(url)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(response.statusText);
+        }
+        return response.text();
+      })
+      .then((html) => {
+        content.innerHTML = html;
+        panel.dataset.loaded = "true";
+      })
+      .catch(() => {
+        content.textContent = panel.dataset.error;
+        delete panel.dataset.loaded;
+      });
+  }
+
+  for (const panel of document.querySelectorAll(".registrations-panel")) {
+    // Registrations are only loaded when the panel is opened
+    panel.addEventListener("toggle", function () {
+      if (panel.open && !panel.dataset.loaded) {
+        loadRegistrations(panel, panel.dataset.url);
+      }
+    });
+    panel.addEventListener("click", function (event) {
+      const link = event.target.closest("a[data-page]");
+      if (link) {
+        event.preventDefault();
+        loadRegistrations(panel, link.href);
+      }
+    });
+  }
+});
@@ -28,6 +28,40 @@ document.addEventListener("DOMContentLoaded", function () {
     }
   }
 
+  /**
+   * Load the past courses of a year when its section is expanded. If the
+   * request fails, an error is shown and the courses are requested again
+   * the next time the section is expanded.
+   */
+  function loadPastCourses(event) {
+    const container = event.target;
+    if (!container.classList.contains("past-courses") ||
+        container.dataset.loaded || container.dataset.loading) {
+      return;
+    }
+    container.dataset.loading = "true";
+    fetch(container.dataset.url)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(response.statusText);
+        }
+        return response.text();
+      })
+      .then((html) => {
+        container.innerHTML = html;
+        container.dataset.loaded = "true";
+      })
+      .catch(() => {
+        const error = document.createElement("p");
+        error.className = "text-danger my-3";
+        error.textContent = container.dataset.error;
+        container.replaceChildren(error);
+      })
+      .finally(() => {
+        delete container.dataset.loading;
+      });
+  }
+
   /**
    * Auto close messages
    */
@@ -52,6 +86,10 @@ document.addEventListener("DOMContentLoaded", function () {
     showHideCoursesBtn.addEventListener("click", updateCoursesButton);
   }
 
+  for (const pastCourses of document.getElementsByClassName("past-courses")) {
+    pastCourses.addEventListener("show.bs.collapse", loadPastCourses);
+  }
+
   if (loginToastElement) {
     const loginToast = new bootstrap.Toast(loginToastElement);
     loginToast.show();